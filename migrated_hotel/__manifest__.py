@@ -7,13 +7,18 @@
     'category': 'Generic Modules/Hotel Management',
     'depends': [
         'hotel',
+        'account_payment_return',
     ],
     'external_dependencies':
         {'python' : ['odoorpc']},
     'license': "AGPL-3",
     'data': [
+        'data/ir_cron_data.xml',
         'views/migrated_hotel_views.xml',
         'views/migrated_log_views.xml',
+        'views/migrated_checkpoint_views.xml',
+        'views/migrated_mapping_views.xml',
+        'views/migrated_run_views.xml',
         'views/inherited_res_partner_views.xml',
         'views/inherited_product_template_views.xml',
         'views/inherited_account_invoice_views.xml',
@@ -0,0 +1,537 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+""" Local stand-in for an Odoo 10 hotel node: a JSON-RPC server answering the
+calls done by odoorpc during the migration with synthetic data.
+"""
+
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from ..tools.remote_domain import filter_records
+
+_logger = logging.getLogger(__name__)
+
+FAKE_DB = 'hootel10'
+FAKE_UID = 1
+
+# remote models: {field: (type, relation)}
+SCHEMA = {
+    'res.users': {
+        'name': ('char', None), 'login': ('char', None), 'partner_id': ('many2one', 'res.partner'),
+    },
+    'res.country': {
+        'name': ('char', None), 'code': ('char', None),
+    },
+    'res.country.state': {
+        'name': ('char', None), 'code': ('char', None), 'country_id': ('many2one', 'res.country'),
+    },
+    'res.partner.category': {
+        'name': ('char', None), 'parent_id': ('many2one', 'res.partner.category'),
+    },
+    'res.partner': {
+        'name': ('char', None), 'lastname': ('char', None), 'firstname': ('char', None),
+        'phone': ('char', None), 'mobile': ('char', None), 'email': ('char', None),
+        'website': ('char', None), 'lang': ('char', None), 'is_company': ('boolean', None),
+        'type': ('selection', None), 'street': ('char', None), 'street2': ('char', None),
+        'zip': ('char', None), 'city': ('char', None), 'state_id': ('many2one', 'res.country.state'),
+        'country_id': ('many2one', 'res.country'), 'comment': ('text', None),
+        'documenttype': ('selection', None), 'poldocument': ('char', None), 'polexpedition': ('date', None),
+        'gender': ('selection', None), 'birthdate_date': ('date', None), 'code_ine': ('many2one', 'code.ine'),
+        'category_id': ('many2many', 'res.partner.category'), 'parent_id': ('many2one', 'res.partner'),
+        'vat': ('char', None), 'user_ids': ('one2many', 'res.users'), 'active': ('boolean', None),
+        'create_date': ('datetime', None), 'write_date': ('datetime', None),
+    },
+    'cardex': {
+        'partner_id': ('many2one', 'res.partner'), 'reservation_id': ('many2one', 'hotel.reservation'),
+    },
+    'product.product': {
+        'name': ('char', None), 'list_price': ('float', None), 'taxes_id': ('many2many', 'account.tax'),
+        'product_tmpl_id': ('many2one', 'product.template'), 'active': ('boolean', None),
+    },
+    'hotel.virtual.room': {
+        'name': ('char', None), 'product_id': ('many2one', 'product.product'), 'active': ('boolean', None),
+    },
+    'hotel.room': {
+        'name': ('char', None), 'product_id': ('many2one', 'product.product'), 'capacity': ('integer', None),
+    },
+    'hotel.room.amenities': {
+        'name': ('char', None), 'product_tmpl_id': ('many2one', 'product.template'),
+    },
+    'wubook.channel.info': {
+        'name': ('char', None), 'wid': ('char', None),
+    },
+    'account.journal': {
+        'name': ('char', None),
+    },
+    'hotel.folio': {
+        'name': ('char', None), 'partner_id': ('many2one', 'res.partner'),
+        'partner_invoice_id': ('many2one', 'res.partner'),
+        'segmentation_id': ('many2many', 'res.partner.category'), 'reservation_type': ('selection', None),
+        'channel_type': ('selection', None), 'wcustomer_notes': ('text', None),
+        'internal_comment': ('text', None), 'state': ('selection', None), 'cancelled_reason': ('text', None),
+        'date_order': ('datetime', None), 'confirmation_date': ('datetime', None),
+        'create_date': ('datetime', None), 'write_date': ('datetime', None),
+        'user_id': ('many2one', 'res.users'), 'create_uid': ('many2one', 'res.users'),
+        'room_lines': ('one2many', 'hotel.reservation'),
+    },
+    'hotel.reservation': {
+        'folio_id': ('many2one', 'hotel.folio'), 'name': ('char', None),
+        'virtual_room_id': ('many2one', 'hotel.virtual.room'), 'product_id': ('many2one', 'product.product'),
+        'discount': ('float', None), 'checkin': ('datetime', None), 'checkout': ('datetime', None),
+        'nights': ('integer', None), 'to_assign': ('boolean', None), 'to_send': ('boolean', None),
+        'state': ('selection', None), 'cancelled_reason': ('text', None),
+        'out_service_description': ('text', None), 'adults': ('integer', None), 'children': ('integer', None),
+        'splitted': ('boolean', None), 'parent_reservation': ('many2one', 'hotel.reservation'),
+        'overbooking': ('boolean', None), 'channel_type': ('selection', None), 'call_center': ('boolean', None),
+        'wrid': ('char', None), 'wbook_json': ('text', None), 'wchannel_id': ('many2one', 'wubook.channel.info'),
+        'wchannel_reservation_code': ('char', None), 'wstatus': ('selection', None),
+        'wstatus_reason': ('char', None), 'wmodified': ('boolean', None),
+        'create_uid': ('many2one', 'res.users'), 'create_date': ('datetime', None),
+        'write_date': ('datetime', None), 'last_updated_res': ('datetime', None),
+        'order_line_id': ('many2one', 'sale.order.line'),
+        'reservation_line_ids': ('one2many', 'hotel.reservation.line'),
+    },
+    'hotel.reservation.line': {
+        'reservation_id': ('many2one', 'hotel.reservation'), 'date': ('date', None), 'price': ('float', None),
+    },
+    'hotel.service.line': {
+        'folio_id': ('many2one', 'hotel.folio'), 'name': ('char', None), 'product_id': ('many2one', 'product.product'),
+        'product_uom_qty': ('float', None), 'price_unit': ('float', None), 'discount': ('float', None),
+        'channel_type': ('selection', None), 'ser_room_line': ('many2one', 'hotel.reservation'),
+        'ser_checkin': ('datetime', None), 'service_line_id': ('many2one', 'sale.order.line'),
+        'write_date': ('datetime', None),
+    },
+    'account.payment': {
+        'partner_id': ('many2one', 'res.partner'), 'journal_id': ('many2one', 'account.journal'),
+        'folio_id': ('many2one', 'hotel.folio'), 'amount': ('float', None), 'payment_date': ('date', None),
+        'communication': ('char', None), 'state': ('selection', None),
+        'create_uid': ('many2one', 'res.users'), 'create_date': ('datetime', None),
+        'write_date': ('datetime', None),
+    },
+    'account.move.line': {
+        'payment_id': ('many2one', 'account.payment'),
+    },
+    'payment.return': {
+        'name': ('char', None), 'date': ('date', None), 'state': ('selection', None),
+        'line_ids': ('one2many', 'payment.return.line'),
+    },
+    'payment.return.line': {
+        'return_id': ('many2one', 'payment.return'), 'amount': ('float', None), 'reference': ('char', None),
+        'move_line_ids': ('many2many', 'account.move.line'),
+    },
+    'account.invoice': {
+        'number': ('char', None), 'invoice_number': ('char', None), 'name': ('char', None),
+        'display_name': ('char', None), 'origin': ('char', None), 'date_invoice': ('date', None),
+        'type': ('selection', None), 'refund_invoice_id': ('many2one', 'account.invoice'),
+        'account_id': ('many2one', 'account.account'), 'partner_id': ('many2one', 'res.partner'),
+        'currency_id': ('many2one', 'res.currency'), 'comment': ('text', None),
+        'payment_ids': ('many2many', 'account.payment'), 'user_id': ('many2one', 'res.users'),
+        'invoice_line_ids': ('one2many', 'account.invoice.line'),
+        'create_uid': ('many2one', 'res.users'), 'create_date': ('datetime', None),
+        'write_date': ('datetime', None),
+    },
+    'account.invoice.line': {
+        'invoice_id': ('many2one', 'account.invoice'), 'name': ('char', None), 'origin': ('char', None),
+        'sale_line_ids': ('many2many', 'sale.order.line'), 'account_id': ('many2one', 'account.account'),
+        'price_unit': ('float', None), 'quantity': ('float', None), 'discount': ('float', None),
+        'uom_id': ('many2one', 'product.uom'), 'invoice_line_tax_ids': ('many2many', 'account.tax'),
+    },
+    'ir.model.data': {
+        'module': ('char', None), 'name': ('char', None), 'model': ('char', None), 'res_id': ('integer', None),
+    },
+}
+
+SERVICE_PRODUCT_NAMES = ['Breakfast', 'Dinner', 'Parking', 'Extra Bed', 'Late Check-out', 'Minibar']
+CATEGORY_NAMES = ['Business', 'Leisure', 'Groups', 'Agency', 'Corporate']
+# 12345678Z is a valid NIF, the other one fails its checksum
+PARTNER_VATS = [False, False, False, 'ES12345678Z', 'ES00000000X']
+
+
+class FakeDataset(object):
+    """ In-memory remote database: {model: {id: record}} where many2one values
+    are ids (or False) and x2many values are lists of ids.
+    """
+
+    def __init__(self):
+        self.records = {model: {} for model in SCHEMA}
+        self._sequences = Counter()
+
+    def create(self, model, vals):
+        self._sequences[model] += 1
+        record_id = self._sequences[model]
+        record = {name: False for name in SCHEMA[model]}
+        record.update(vals, id=record_id)
+        self.records[model][record_id] = record
+        return record_id
+
+    def add_xmlid(self, model, record_id, xmlid):
+        module, name = xmlid.split('.', 1)
+        self.create('ir.model.data', {'module': module, 'name': name, 'model': model, 'res_id': record_id})
+
+    def link(self, model, record_id, field_name, related_id):
+        self.records[model][record_id][field_name].append(related_id)
+
+    def count(self):
+        return {model: len(records) for model, records in self.records.items() if records}
+
+
+def build_dataset(partners=1000, folios=500, reservations_per_folio=2, nights=3, services_per_folio=2,
+                  payments_per_folio=1, invoice_ratio=0.5, return_ratio=0.01, seed=10,
+                  country_xmlids=None, state_xmlids=None, room_type_xmlids=None, room_xmlids=None,
+                  user_logins=None, journal_names=None, ota_wids=None):
+    """ Synthetic Odoo 10 hotel data. Reference records (countries, room types,
+    users, journals...) can be given the xmlids, logins and names of the local
+    database so that the migration maps them.
+    """
+    rnd = random.Random(seed)
+    dataset = FakeDataset()
+    base_date = datetime.datetime(2018, 1, 1, 12, 0, 0)
+
+    def date_time(days):
+        return (base_date + datetime.timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    # reference data
+    country_ids = []
+    for xmlid in country_xmlids or ['base.es', 'base.pt', 'base.fr', 'base.de', 'base.gb', 'base.it']:
+        country_id = dataset.create('res.country', {'name': xmlid, 'code': xmlid[-2:].upper()})
+        dataset.add_xmlid('res.country', country_id, xmlid)
+        country_ids.append(country_id)
+    state_ids = []
+    for xmlid in state_xmlids or ['base.state_es_c', 'base.state_es_m', 'base.state_es_b']:
+        state_id = dataset.create('res.country.state', {'name': xmlid, 'country_id': country_ids[0]})
+        dataset.add_xmlid('res.country.state', state_id, xmlid)
+        state_ids.append(state_id)
+    category_ids = [dataset.create('res.partner.category', {'name': x}) for x in CATEGORY_NAMES]
+    user_ids = []
+    for login in user_logins or ['admin']:
+        partner_id = dataset.create('res.partner', {
+            'name': login, 'active': True, 'create_date': date_time(0), 'user_ids': []})
+        user_id = dataset.create('res.users', {'name': login, 'login': login, 'partner_id': partner_id})
+        dataset.link('res.partner', partner_id, 'user_ids', user_id)
+        user_ids.append(user_id)
+    journal_ids = [dataset.create('account.journal', {'name': x}) for x in journal_names or ['Cash', 'Bank']]
+    ota_ids = [dataset.create('wubook.channel.info', {'name': 'OTA %s' % x, 'wid': str(x)})
+               for x in ota_wids or [1, 2, 3]]
+
+    room_type_ids = []
+    for index, xmlid in enumerate(room_type_xmlids or ['hotel.hotel_room_type_%s' % x for x in range(1, 4)]):
+        product_id = dataset.create('product.product', {
+            'name': 'Room Type %s' % index, 'list_price': 60.0, 'taxes_id': [], 'active': True})
+        room_type_id = dataset.create('hotel.virtual.room', {
+            'name': 'Room Type %s' % index, 'product_id': product_id, 'active': True})
+        dataset.add_xmlid('hotel.virtual.room', room_type_id, xmlid)
+        room_type_ids.append(room_type_id)
+    room_product_ids = []
+    for index, xmlid in enumerate(room_xmlids or ['hotel.hotel_room_%s' % x for x in range(1, 11)]):
+        product_id = dataset.create('product.product', {
+            'name': 'Room %s' % index, 'list_price': 60.0, 'taxes_id': [], 'active': True})
+        dataset.records['product.product'][product_id]['product_tmpl_id'] = product_id
+        room_id = dataset.create('hotel.room', {'name': 'Room %s' % index, 'product_id': product_id, 'capacity': 3})
+        dataset.add_xmlid('hotel.room', room_id, xmlid)
+        room_product_ids.append(product_id)
+    service_product_ids = []
+    for name in SERVICE_PRODUCT_NAMES:
+        product_id = dataset.create('product.product', {
+            'name': name, 'list_price': rnd.choice([5.0, 10.0, 15.0]), 'taxes_id': [], 'active': True})
+        dataset.records['product.product'][product_id]['product_tmpl_id'] = product_id
+        service_product_ids.append(product_id)
+    dataset.create('hotel.room.amenities', {'name': 'Amenities', 'product_tmpl_id': room_product_ids[0]})
+
+    # partners, 5% of them are contacts of the previous company
+    partner_ids = []
+    for index in range(partners):
+        is_contact = partner_ids and rnd.random() < 0.05
+        partner_ids.append(dataset.create('res.partner', {
+            'name': 'Guest %s' % index, 'firstname': 'Guest', 'lastname': str(index),
+            'email': 'guest%s@example.com' % index, 'phone': '600%06d' % index, 'lang': 'es_ES',
+            'is_company': not is_contact and rnd.random() < 0.1, 'type': 'contact',
+            'street': 'Street %s' % index, 'zip': '15001', 'city': 'A Coruña',
+            'state_id': rnd.choice(state_ids), 'country_id': rnd.choice(country_ids),
+            'documenttype': 'D', 'poldocument': '%08d' % index, 'gender': rnd.choice(['male', 'female']),
+            'category_id': rnd.sample(category_ids, rnd.randint(0, 2)),
+            'parent_id': is_contact and partner_ids[-1] or False,
+            'vat': not is_contact and rnd.choice(PARTNER_VATS), 'user_ids': [],
+            'active': rnd.random() > 0.02, 'create_date': date_time(rnd.randint(0, 300)),
+        }))
+
+    # folios with their reservations, night lines and services
+    order_line_id = 0
+    for index in range(folios):
+        day = rnd.randint(0, 400)
+        partner_id = rnd.choice(partner_ids)
+        user_id = rnd.choice(user_ids)
+        channel_type = rnd.choice(['door', 'door', 'phone', 'web'])
+        folio_id = dataset.create('hotel.folio', {
+            'name': 'SO%05d' % index, 'partner_id': partner_id, 'partner_invoice_id': partner_id,
+            'segmentation_id': rnd.sample(category_ids, 1), 'reservation_type': 'normal',
+            'channel_type': channel_type, 'state': rnd.choice(['sale', 'sale', 'done', 'cancel']),
+            'date_order': date_time(day - 10), 'confirmation_date': date_time(day - 10),
+            'create_date': date_time(day - 10), 'write_date': date_time(day),
+            'user_id': user_id, 'create_uid': user_id, 'room_lines': [],
+        })
+        folio_reservation_ids = []
+        # a few folios only have services
+        for dummy in range(rnd.random() > 0.05 and reservations_per_folio or 0):
+            order_line_id += 1
+            product_id = rnd.choice(room_product_ids)
+            reservation_nights = rnd.randint(1, nights)
+            reservation_vals = {
+                'folio_id': folio_id, 'name': 'R/%05d' % order_line_id,
+                'virtual_room_id': rnd.choice(room_type_ids), 'product_id': product_id,
+                'discount': 0.0, 'checkin': date_time(day), 'checkout': date_time(day + reservation_nights),
+                'nights': reservation_nights, 'state': 'done', 'adults': rnd.randint(1, 3), 'children': 0,
+                'channel_type': channel_type, 'create_uid': user_id, 'create_date': date_time(day - 10),
+                'write_date': date_time(day), 'last_updated_res': date_time(day - 10),
+                'order_line_id': order_line_id, 'reservation_line_ids': [],
+            }
+            if channel_type == 'web':
+                reservation_vals.update({
+                    'wrid': str(1000000 + order_line_id), 'wbook_json': '{}', 'wchannel_id': rnd.choice(ota_ids),
+                    'wchannel_reservation_code': 'OTA%s' % order_line_id, 'wstatus': '1',
+                })
+            reservation_id = dataset.create('hotel.reservation', reservation_vals)
+            for night in range(reservation_nights):
+                line_id = dataset.create('hotel.reservation.line', {
+                    'reservation_id': reservation_id,
+                    'date': date_time(day + night)[:10], 'price': 60.0,
+                })
+                dataset.link('hotel.reservation', reservation_id, 'reservation_line_ids', line_id)
+            dataset.link('hotel.folio', folio_id, 'room_lines', reservation_id)
+            dataset.create('cardex', {'partner_id': rnd.choice(partner_ids), 'reservation_id': reservation_id})
+            folio_reservation_ids.append(reservation_id)
+
+        folio_service_ids = []
+        for dummy in range(services_per_folio):
+            order_line_id += 1
+            product_id = rnd.choice(service_product_ids)
+            folio_service_ids.append(dataset.create('hotel.service.line', {
+                'folio_id': folio_id, 'name': SERVICE_PRODUCT_NAMES[service_product_ids.index(product_id)],
+                'product_id': product_id, 'product_uom_qty': rnd.randint(1, 3), 'price_unit': 10.0,
+                'discount': 0.0, 'channel_type': 'door',
+                'ser_room_line': folio_reservation_ids and rnd.choice(folio_reservation_ids) or False,
+                'ser_checkin': date_time(day), 'service_line_id': order_line_id, 'write_date': date_time(day),
+            }))
+
+        folio_payment_ids = []
+        for dummy in range(payments_per_folio):
+            payment_id = dataset.create('account.payment', {
+                'partner_id': partner_id, 'journal_id': rnd.choice(journal_ids), 'folio_id': folio_id,
+                'amount': 100.0, 'payment_date': date_time(day)[:10], 'communication': 'SO%05d' % index,
+                'state': 'posted', 'create_uid': user_id, 'create_date': date_time(day),
+                'write_date': date_time(day),
+            })
+            folio_payment_ids.append(payment_id)
+            if rnd.random() < return_ratio:
+                move_line_id = dataset.create('account.move.line', {'payment_id': payment_id})
+                return_id = dataset.create('payment.return', {
+                    'name': 'RET/%05d' % payment_id, 'date': date_time(day + 5)[:10], 'state': 'done',
+                    'line_ids': [],
+                })
+                return_line_id = dataset.create('payment.return.line', {
+                    'return_id': return_id, 'amount': 100.0, 'reference': 'SO%05d' % index,
+                    'move_line_ids': [move_line_id],
+                })
+                dataset.link('payment.return', return_id, 'line_ids', return_line_id)
+
+        if rnd.random() < invoice_ratio:
+            invoice_id = dataset.create('account.invoice', {
+                'number': 'INV/2018/%05d' % index, 'invoice_number': 'INV/2018/%05d' % index,
+                'name': 'SO%05d' % index, 'display_name': 'INV/2018/%05d' % index, 'origin': 'SO%05d' % index,
+                'date_invoice': date_time(day)[:10], 'type': 'out_invoice', 'partner_id': partner_id,
+                'payment_ids': folio_payment_ids, 'user_id': user_id, 'invoice_line_ids': [],
+                'create_uid': user_id, 'create_date': date_time(day), 'write_date': date_time(day),
+            })
+            sale_lines = [dataset.records['hotel.reservation'][x] for x in folio_reservation_ids]
+            sale_lines += [dataset.records['hotel.service.line'][x] for x in folio_service_ids]
+            for sale_line in sale_lines:
+                invoice_line_id = dataset.create('account.invoice.line', {
+                    'invoice_id': invoice_id, 'name': sale_line['name'], 'origin': 'SO%05d' % index,
+                    'sale_line_ids': [sale_line.get('order_line_id') or sale_line['service_line_id']],
+                    'price_unit': 60.0, 'quantity': 1.0, 'discount': 0.0, 'invoice_line_tax_ids': [],
+                })
+                dataset.link('account.invoice', invoice_id, 'invoice_line_ids', invoice_line_id)
+
+    return dataset
+
+
+class FakeOdoo10Server(ThreadingMixIn, HTTPServer):
+    """ Threaded JSON-RPC server serving `dataset` as an Odoo 10 node would,
+    waiting `latency` seconds before answering every request.
+
+    `stats` counts the requests per (model, method), and `bytes_in`/`bytes_out`
+    the size of the request and response bodies.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, dataset, host='127.0.0.1', port=0, latency=0.0):
+        HTTPServer.__init__(self, (host, port), FakeOdoo10Handler)
+        self.dataset = dataset
+        self.latency = latency
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = Counter()
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def count_request(self, key, bytes_in, bytes_out):
+        with self._stats_lock:
+            self.stats[key] += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    @property
+    def request_count(self):
+        return sum(self.stats.values())
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name='fake-odoo10', daemon=True)
+        thread.start()
+        _logger.info('Fake Odoo 10 node listening on %s:%s', *self.server_address)
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    # model methods called through execute / execute_kw
+
+    def _read_record(self, model, record, field_names, load=None):
+        result = {'id': record['id']}
+        for name in field_names or SCHEMA[model]:
+            field_type, relation = SCHEMA[model].get(name, ('char', None))
+            value = record.get(name, False)
+            if field_type == 'many2one' and value and load != '_classic_write':
+                related = self.dataset.records.get(relation, {}).get(value, {})
+                value = [value, related.get('name') or '%s,%s' % (relation, value)]
+            elif field_type in ('one2many', 'many2many'):
+                value = list(value or [])
+            result[name] = value
+        return result
+
+    def _search_records(self, model, domain, offset=0, limit=None, order=None, context=None):
+        records = list(self.dataset.records[model].values())
+        records = filter_records(records, domain or [], (context or {}).get('active_test', True))
+        if order:
+            for order_term in reversed(order.split(',')):
+                field_name, dummy, direction = order_term.strip().partition(' ')
+                records.sort(key=lambda x: x.get(field_name) or 0, reverse=direction.lower() == 'desc')
+        records = records[offset or 0:]
+        if limit:
+            records = records[:limit]
+        return records
+
+    def call_method(self, model, method, args, kwargs):
+        if model not in self.dataset.records:
+            raise ValueError("Object %s doesn't exist" % model)
+        context = kwargs.get('context')
+        if method == 'fields_get':
+            return {name: {'type': field_type, 'string': name, 'relation': relation or False}
+                    for name, (field_type, relation) in SCHEMA[model].items()}
+        if method == 'search':
+            records = self._search_records(
+                model, args and args[0] or kwargs.get('domain') or kwargs.get('args'), kwargs.get('offset'),
+                kwargs.get('limit'), kwargs.get('order'), context)
+            if kwargs.get('count'):
+                return len(records)
+            return [x['id'] for x in records]
+        if method == 'search_count':
+            return len(self._search_records(model, args and args[0] or kwargs.get('domain'), context=context))
+        if method == 'search_read':
+            domain = args and args[0] or kwargs.get('domain')
+            field_names = len(args) > 1 and args[1] or kwargs.get('fields')
+            records = self._search_records(
+                model, domain, kwargs.get('offset'), kwargs.get('limit'), kwargs.get('order'), context)
+            return [self._read_record(model, x, field_names) for x in records]
+        if method == 'read':
+            ids = args[0] if isinstance(args[0], list) else [args[0]]
+            field_names = len(args) > 1 and args[1] or kwargs.get('fields')
+            return [self._read_record(model, self.dataset.records[model][x], field_names, kwargs.get('load'))
+                    for x in ids if x in self.dataset.records[model]]
+        if method == 'read_group':
+            domain = args and args[0] or kwargs.get('domain')
+            groupby = len(args) > 2 and args[2] or kwargs.get('groupby')
+            group_field = groupby[0] if isinstance(groupby, list) else groupby
+            groups = Counter(x.get(group_field) or False
+                             for x in self._search_records(model, domain, context=context))
+            offset = len(args) > 3 and args[3] or kwargs.get('offset') or 0
+            limit = len(args) > 4 and args[4] or kwargs.get('limit')
+            values = sorted(groups.items(), key=lambda x: x[0] or 0)
+            values = values[offset:offset + limit] if limit else values[offset:]
+            result = []
+            for value, count in values:
+                record = self._read_record(model, {'id': 0, group_field: value}, [group_field])
+                result.append({group_field: record[group_field], '%s_count' % group_field: count,
+                               '__domain': [(group_field, '=', value)] + list(domain or [])})
+            return result
+        if method == 'get_external_id':
+            ids = args[0] if isinstance(args[0], list) else [args[0]]
+            xmlids = {x['res_id']: '%s.%s' % (x['module'], x['name'])
+                      for x in self.dataset.records['ir.model.data'].values() if x['model'] == model}
+            return {str(x): xmlids.get(x, '') for x in ids}
+        if method == 'name_get':
+            return [[x, self.dataset.records[model][x].get('name')] for x in args[0]]
+        raise ValueError("Method %s of %s is not available on the fake node" % (method, model))
+
+
+class FakeOdoo10Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        _logger.debug(format, *args)
+
+    def _answer(self, payload, request_id, key, bytes_in):
+        body = json.dumps(dict(payload, jsonrpc='2.0', id=request_id)).encode('utf-8')
+        self.server.count_request(key, bytes_in, len(body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'session_id=fake-odoo10; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        bytes_in = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(bytes_in).decode('utf-8') or '{}')
+        params = request.get('params') or {}
+        key = ('session', self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            if self.path == '/web/webclient/version_info':
+                result = {'server_version': '10.0', 'server_version_info': [10, 0, 0, 'final', 0, '']}
+            elif self.path in ('/web/session/authenticate', '/web/session/get_session_info'):
+                result = {'uid': FAKE_UID, 'db': FAKE_DB, 'user_context': {'lang': 'es_ES', 'tz': 'Europe/Madrid'}}
+            elif self.path == '/web/session/destroy':
+                result = True
+            elif self.path == '/jsonrpc' and params.get('method') in ('execute', 'execute_kw'):
+                model, method = params['args'][3:5]
+                key = (model, method)
+                if params['method'] == 'execute_kw':
+                    args, kwargs = params['args'][5], params['args'][6] if len(params['args']) > 6 else {}
+                else:
+                    args, kwargs = params['args'][5:], {}
+                result = self.server.call_method(model, method, args, kwargs or {})
+            else:
+                raise ValueError('Unknown route %s' % self.path)
+        except Exception as err:
+            error = {'code': 200, 'message': 'Odoo Server Error',
+                     'data': {'name': type(err).__name__, 'message': str(err), 'debug': str(err)}}
+            self._answer({'error': error}, request.get('id'), key, bytes_in)
+            return
+        self._answer({'result': result}, request.get('id'), key, bytes_in)
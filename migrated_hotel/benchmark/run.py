@@ -0,0 +1,178 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+""" Offline benchmark of the migration stages against a fake Odoo 10 node.
+
+Run it with the Python environment of the Odoo 11 server, on a disposable
+database with this module installed::
+
+    python3 migrated_hotel/benchmark/run.py -c odoo.conf -d hootel_bench --partners 5000 --latency 0.02
+
+Every stage is run in order against synthetic data and reported with its
+duration, migrated records per second, remote calls and bytes, and local
+SQL queries.
+"""
+
+import argparse
+import time
+
+FAKE_HOST = '127.0.0.1'
+
+STAGES = [
+    ('partners', 'action_migrate_partners', 'res.partner'),
+    ('products', 'action_migrate_products', 'product.product'),
+    ('folios', 'action_migrate_folios', 'hotel.folio'),
+    ('reservations', 'action_migrate_reservations', 'hotel.reservation'),
+    ('services', 'action_migrate_services', 'hotel.service'),
+    ('payments', 'action_migrate_payments', 'account.payment'),
+    ('invoices', 'action_migrate_invoices', 'account.invoice'),
+]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', required=True, help='Odoo 11 configuration file')
+    parser.add_argument('-d', '--database', required=True, help='disposable database with migrated_hotel')
+    parser.add_argument('--stages', default=','.join(x[0] for x in STAGES),
+                        help='comma separated stages to run, in migration order')
+    parser.add_argument('--partners', type=int, default=1000)
+    parser.add_argument('--folios', type=int, default=500)
+    parser.add_argument('--reservations-per-folio', type=int, default=2)
+    parser.add_argument('--nights', type=int, default=3, help='maximum nights per reservation')
+    parser.add_argument('--services-per-folio', type=int, default=2)
+    parser.add_argument('--payments-per-folio', type=int, default=1)
+    parser.add_argument('--invoice-ratio', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every remote call')
+    parser.add_argument('--port', type=int, default=0, help='port of the fake node (random by default)')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--commit-interval', type=int, default=100)
+    parser.add_argument('--prefetch', type=int, default=2, help='remote batches read ahead, 0 to disable')
+    parser.add_argument('--rpc-detail', action='store_true', help='list the remote calls of every stage')
+    return parser.parse_args(argv)
+
+
+def _local_references(env):
+    # reference data of the local database, so that the fake node is mapped to it
+    def xmlids(model):
+        return ['%s.%s' % (x.module, x.name) for x in env['ir.model.data'].search([('model', '=', model)])]
+
+    references = {
+        'room_type_xmlids': xmlids('hotel.room.type') or None,
+        'room_xmlids': xmlids('hotel.room') or None,
+        'user_logins': env['res.users'].search([]).mapped('login'),
+        'journal_names': env['account.journal'].search([]).mapped('name') or None,
+    }
+    if 'channel.ota.info' in env:
+        references['ota_wids'] = [int(x) for x in env['channel.ota.info'].search([]).mapped('ota_id') if x] or None
+    return references
+
+
+def _plain_jsonrpc(connect_remote):
+    # the fake node serves plain HTTP on the loopback interface, while the module
+    # only reaches remote nodes over TLS
+    def connect(host, protocol, *args):
+        if host == FAKE_HOST and protocol == 'jsonrpc+ssl':
+            protocol = 'jsonrpc'
+        return connect_remote(host, protocol, *args)
+    return connect
+
+
+def _count_migrated(env, model):
+    cr = env.cr
+    if model == 'product.product':
+        # remote_id is stored in the product template
+        cr.execute('''SELECT count(*) FROM product_product pp
+                      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                      WHERE pt.remote_id > 0''')
+    else:
+        cr.execute('SELECT count(*) FROM ' + env[model]._table + ' WHERE remote_id > 0')
+    return cr.fetchone()[0]
+
+
+def _run_stage(hotel, server, stage, method_name, model):
+    cr = hotel.env.cr
+    migrated_before = _count_migrated(hotel.env, model)
+    server.reset_stats()
+    sql_count = cr.sql_log_count
+    start_time = time.time()
+    getattr(hotel, method_name)()
+    elapsed = time.time() - start_time
+    sql_count = cr.sql_log_count - sql_count
+    migrated = _count_migrated(hotel.env, model) - migrated_before
+    return {
+        'stage': stage,
+        'seconds': elapsed,
+        'records': migrated,
+        'throughput': migrated / elapsed if elapsed else 0.0,
+        'rpc_calls': server.request_count,
+        'rpc_kbytes': (server.bytes_in + server.bytes_out) / 1024.0,
+        'sql_queries': sql_count,
+        'rpc_detail': server.stats.most_common(),
+    }
+
+
+def _print_report(results, rpc_detail=False):
+    print('%-14s %10s %9s %10s %10s %10s %12s' % (
+        'stage', 'seconds', 'records', 'records/s', 'RPC calls', 'RPC KB', 'SQL queries'))
+    for result in results:
+        print('%(stage)-14s %(seconds)10.2f %(records)9d %(throughput)10.1f '
+              '%(rpc_calls)10d %(rpc_kbytes)10.1f %(sql_queries)12d' % result)
+        if rpc_detail:
+            for (model, method), count in result['rpc_detail']:
+                print('    %6d  %s.%s' % (count, model, method))
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    stages = [x for x in STAGES if x[0] in args.stages.split(',')]
+
+    import odoo
+    odoo.tools.config.parse_config(['-c', args.config, '-d', args.database])
+    # the addons path is only known once the configuration is parsed
+    from odoo.addons.migrated_hotel.benchmark.fake_odoo10 import (
+        FAKE_DB, FakeOdoo10Server, build_dataset)
+    from odoo.addons.migrated_hotel.models import migrated_hotel
+    from odoo.addons.migrated_hotel.tools import remote_session
+    remote_session.connect_remote = migrated_hotel.connect_remote = _plain_jsonrpc(remote_session.connect_remote)
+
+    results = []
+    with odoo.api.Environment.manage():
+        registry = odoo.registry(args.database)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            dataset = build_dataset(
+                partners=args.partners, folios=args.folios,
+                reservations_per_folio=args.reservations_per_folio, nights=args.nights,
+                services_per_folio=args.services_per_folio, payments_per_folio=args.payments_per_folio,
+                invoice_ratio=args.invoice_ratio, seed=args.seed, **_local_references(env))
+            print('Fake Odoo 10 node: %s' % ', '.join(
+                '%s %s' % (count, model) for model, count in sorted(dataset.count().items())))
+            server = FakeOdoo10Server(dataset, host=FAKE_HOST, port=args.port, latency=args.latency)
+            server.start()
+            try:
+                hotel = env['migrated.hotel'].create({
+                    'name': 'Benchmark %s' % time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'odoo_host': FAKE_HOST,
+                    'odoo_protocol': 'jsonrpc+ssl',
+                    'odoo_port': server.port,
+                    'odoo_db': FAKE_DB,
+                    'odoo_user': 'admin',
+                    'odoo_password': 'admin',
+                    'migration_workers': args.workers,
+                    'migration_batch_size': args.batch_size,
+                    'migration_commit_interval': args.commit_interval,
+                    'migration_prefetch_batches': args.prefetch,
+                })
+                cr.commit()
+                for stage, method_name, model in stages:
+                    results.append(_run_stage(hotel, server, stage, method_name, model))
+            finally:
+                server.stop()
+
+    _print_report(results, args.rpc_detail)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,14 @@
 
 from . import migrated_hotel
 from . import migrated_log
+from . import migrated_checkpoint
+from . import migrated_mapping
+from . import migrated_run
 from . import inherited_res_partner
 from . import inherited_product_template
 from . import inherited_hotel_folio
 from . import inherited_hotel_reservation
 from . import inherited_hotel_service
 from . import inherited_account_payment
+from . import inherited_payment_return
 from . import inherited_account_invoice
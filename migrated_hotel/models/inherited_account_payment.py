@@ -8,5 +8,5 @@ class AccountPayment(models.Model):
 
     _inherit = 'account.payment'
 
-    remote_id = fields.Integer(require=True, copy=False, readonly=True,
+    remote_id = fields.Integer(require=True, copy=False, readonly=True, index=True,
             help="ID of the target record in the previous version")
@@ -8,7 +8,7 @@ class HotelReservation(models.Model):
 
     _inherit = 'hotel.reservation'
 
-    remote_id = fields.Integer(require=True, copy=False, readonly=True,
+    remote_id = fields.Integer(require=True, copy=False, readonly=True, index=True,
             help="ID of the target record in the previous version")
 
     @api.multi
@@ -8,5 +8,5 @@ class HotelService(models.Model):
 
     _inherit = 'hotel.service'
 
-    remote_id = fields.Integer(require=True, copy=False, readonly=True,
+    remote_id = fields.Integer(require=True, copy=False, readonly=True, index=True,
             help="ID of the target record in the previous version")
@@ -0,0 +1,12 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models, fields, api
+
+
+class PaymentReturn(models.Model):
+
+    _inherit = 'payment.return'
+
+    remote_id = fields.Integer(require=True, copy=False, readonly=True, index=True,
+            help="ID of the target record in the previous version")
@@ -0,0 +1,97 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class MigratedCheckpoint(models.Model):
+    _name = 'migrated.checkpoint'
+
+    migrated_hotel_id = fields.Many2one('migrated.hotel', required=True, ondelete='cascade')
+    model = fields.Selection([
+        ('partner', 'res.partner'),
+        ('partner_contact', 'res.partner (contacts)'),
+        ('folio', 'hotel.folio'),
+        ('reservation', 'hotel.reservation'),
+        ('service', 'hotel.service'),
+        ('payment', 'account.payment'),
+        ('invoice', 'account.invoice'),
+    ], required=True)
+    last_remote_id = fields.Integer(
+        'High-water Remote ID', readonly=True,
+        help="Remote records up to this ID were processed in a committed batch. "
+             "An interrupted migration is resumed from here, a finished one starts again from the first ID")
+    batch_count = fields.Integer('Committed Batches', readonly=True)
+    peak_rss = fields.Integer('Peak Memory (MB)', readonly=True,
+                              help="Highest resident memory of the processes migrating this model")
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], readonly=True, default='running')
+    date_time = fields.Datetime(readonly=True)
+    sync_write_date = fields.Datetime(
+        'Synced up to', readonly=True,
+        help="Remote records written after this date are migrated again by the next delta sync")
+
+    _sql_constraints = [
+        ('model_uniq', 'unique(migrated_hotel_id, model)',
+         'Only one checkpoint per model is allowed for each remote node'),
+    ]
+
+    @api.multi
+    def _resume_remote_ids(self, remote_ids):
+        # remote_ids are expected in ascending order, as they are migrated
+        if self.state == 'done':
+            # only an interrupted pass is resumed: the next one (e.g. the >= D-date pass,
+            # or a retry of the failed records) scans again every remote id
+            self._restart()
+            return remote_ids
+        if not self.last_remote_id:
+            return remote_ids
+        pending_ids = [x for x in remote_ids if x > self.last_remote_id]
+        _logger.info("Resuming '%s' after remote ID [%s]: %s of %s remote records are already processed",
+                     self.model, self.last_remote_id, len(remote_ids) - len(pending_ids), len(remote_ids))
+        return pending_ids
+
+    @api.multi
+    def _commit_batch(self, remote_ids):
+        # an empty checkpoint (i.e. in a parallel worker) only commits the batch
+        if self and remote_ids:
+            self.write({
+                'last_remote_id': max(self.last_remote_id, max(remote_ids)),
+                'batch_count': self.batch_count + 1,
+                'state': 'running',
+                'date_time': fields.Datetime.now(),
+            })
+        self.env.cr.commit()
+
+    @api.multi
+    def _update_peak_rss(self, rss):
+        # peak_rss is written with the next committed batch
+        if self and rss > self.peak_rss:
+            self.peak_rss = rss
+
+    @api.multi
+    def _restart(self):
+        # scan again the remote ids below the high-water mark of the previous pass
+        if self.state == 'done':
+            self.write({
+                'last_remote_id': 0,
+                'batch_count': 0,
+                'state': 'running',
+            })
+
+    @api.multi
+    def _set_done(self, sync_write_date=None):
+        vals = {
+            'state': 'done',
+            'date_time': fields.Datetime.now(),
+        }
+        if sync_write_date:
+            vals['sync_write_date'] = sync_write_date
+        self.write(vals)
+        self.env.cr.commit()
+        _logger.info("Migration of '%s' done with a peak memory of %s MB", self.model, self.peak_rss)
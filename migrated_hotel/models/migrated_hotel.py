@@ -1,15 +1,173 @@
 # Copyright 2019  Pablo Q. Barriuso
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import functools
 import logging
+import time
 import urllib.error
+import psycopg2
 import odoorpc.odoo
 from odoo.exceptions import ValidationError
 from odoo import models, fields, api
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
+from ..tools import MigratedLogBuffer, RemoteIdResolver, TransactionBatcher, run_in_workers, connect_remote, \
+    get_session_pool, rpc_stats, add_run_rpc_stats, pop_run_rpc_stats, current_rss, VatCheckCache, prefetch_batches, RemoteSnapshot, export_snapshot, \
+    load_snapshot, run_stage_graph, critical_path
 
 _logger = logging.getLogger(__name__)
 
+# seconds a stage waits for a free remote session
+SESSION_ACQUIRE_TIMEOUT = 600
+
+# methods computing the remote -> local id maps of the reference models
+MAPPING_BUILDERS = {
+    'res.users': '_build_res_users_map_ids',
+    'res.partner.category': '_build_category_map_ids',
+    'res.country': '_build_country_map_ids',
+    'res.country.state': '_build_country_state_map_ids',
+    'hotel.room.type': '_build_room_type_map_ids',
+    'hotel.room': '_build_room_map_ids',
+    'channel.ota.info': '_build_ota_map_ids',
+    'account.journal': '_build_journal_map_ids',
+}
+
+# remote models referencing the partners to migrate, and width of the ranges of partner ids grouped per call
+PARTNER_INTEREST_MODELS = ['hotel.folio', 'cardex', 'account.payment', 'account.invoice']
+PARTNER_INTEREST_PAGE_SIZE = 5000
+
+# remote fields read by the _prepare_*_remote_data functions
+REMOTE_PARTNER_FIELDS = [
+    'name', 'lastname', 'firstname', 'phone', 'mobile', 'email', 'website', 'lang',
+    'is_company', 'type', 'street', 'street2', 'zip', 'city', 'state_id', 'country_id',
+    'comment', 'documenttype', 'poldocument', 'polexpedition', 'gender', 'birthdate_date',
+    'code_ine', 'category_id', 'parent_id', 'vat',
+]
+REMOTE_PRODUCT_FIELDS = [
+    'name', 'taxes_id', 'list_price',
+]
+REMOTE_FOLIO_FIELDS = [
+    'name', 'partner_id', 'partner_invoice_id', 'segmentation_id', 'reservation_type',
+    'channel_type', 'wcustomer_notes', 'internal_comment', 'state', 'cancelled_reason',
+    'date_order', 'confirmation_date', 'create_date', 'user_id', 'create_uid',
+]
+REMOTE_RESERVATION_FIELDS = [
+    'folio_id', 'name', 'virtual_room_id', 'product_id', 'discount', 'checkin', 'checkout',
+    'nights', 'to_assign', 'to_send', 'state', 'cancelled_reason', 'out_service_description',
+    'adults', 'children', 'splitted', 'parent_reservation', 'overbooking', 'channel_type',
+    'call_center', 'wrid', 'wbook_json', 'wchannel_id', 'wchannel_reservation_code', 'wstatus',
+    'wstatus_reason', 'wmodified', 'create_uid', 'last_updated_res',
+]
+REMOTE_SERVICE_FIELDS = [
+    'folio_id', 'name', 'product_id', 'product_uom_qty', 'price_unit', 'discount', 'channel_type',
+    'ser_room_line', 'ser_checkin', 'service_line_id',
+]
+REMOTE_PAYMENT_FIELDS = [
+    'partner_id', 'journal_id', 'folio_id', 'amount', 'payment_date', 'communication',
+]
+REMOTE_PAYMENT_RETURN_FIELDS = [
+    'name', 'date', 'line_ids',
+]
+REMOTE_PAYMENT_RETURN_LINE_FIELDS = [
+    'return_id', 'amount', 'reference', 'move_line_ids',
+]
+REMOTE_INVOICE_LINE_FIELDS = [
+    'invoice_id', 'name', 'origin', 'sale_line_ids', 'account_id', 'price_unit', 'quantity',
+    'discount', 'uom_id', 'invoice_line_tax_ids',
+]
+REMOTE_INVOICE_FIELDS = [
+    'number', 'invoice_number', 'name', 'display_name', 'origin', 'date_invoice', 'type',
+    'refund_invoice_id', 'account_id', 'partner_id', 'currency_id', 'comment',
+    'payment_ids', 'user_id',
+]
+
+# x2many lines updated in place by a delta sync, matched by the given field: other records
+# reference them (e.g. invoice lines reference the night lines of their reservation, and the
+# channel keeps the binding of its reservations)
+UPDATE_LINE_KEYS = {
+    ('hotel.reservation', 'reservation_line_ids'): 'date',
+    ('hotel.reservation', 'channel_bind_ids'): 'external_id',
+}
+
+# stages of a full migration: {stage: (method, stages whose records it references)}
+STAGE_GRAPH = {
+    'products': ('action_migrate_products', []),
+    'partners': ('action_migrate_partners', []),
+    'folios': ('action_migrate_folios', ['partners']),
+    'reservations': ('action_migrate_reservations', ['folios']),
+    'services': ('action_migrate_services', ['products', 'reservations']),
+    'payments': ('action_migrate_payments', ['partners', 'folios']),
+    'payment_returns': ('action_migrate_payment_returns', ['payments']),
+    'invoices': ('action_migrate_invoices', ['reservations', 'services', 'payments']),
+    'special_field_names': ('action_update_special_field_names', ['payment_returns', 'invoices']),
+}
+
+# remote fields and domain exported to a snapshot for every model read by the stages,
+# i.e. the fields read and the fields searched on
+SNAPSHOT_AUDIT_FIELDS = ['create_uid', 'create_date', 'write_date']
+SNAPSHOT_MODELS = {
+    'res.partner': (REMOTE_PARTNER_FIELDS + ['user_ids'] + SNAPSHOT_AUDIT_FIELDS, []),
+    'cardex': (['partner_id'], []),
+    'hotel.folio': (REMOTE_FOLIO_FIELDS + ['room_lines', 'write_date'], []),
+    'hotel.reservation': (REMOTE_RESERVATION_FIELDS + ['order_line_id'] + SNAPSHOT_AUDIT_FIELDS[1:], []),
+    'hotel.reservation.line': (['reservation_id', 'date', 'price'], []),
+    'hotel.service.line': (REMOTE_SERVICE_FIELDS + SNAPSHOT_AUDIT_FIELDS, []),
+    'account.payment': (REMOTE_PAYMENT_FIELDS + ['state'] + SNAPSHOT_AUDIT_FIELDS, []),
+    'account.move.line': (['payment_id'], [('payment_id', '!=', False)]),
+    'payment.return': (REMOTE_PAYMENT_RETURN_FIELDS + ['state'], []),
+    'payment.return.line': (REMOTE_PAYMENT_RETURN_LINE_FIELDS, []),
+    'account.invoice': (REMOTE_INVOICE_FIELDS + SNAPSHOT_AUDIT_FIELDS, []),
+    'account.invoice.line': (REMOTE_INVOICE_LINE_FIELDS, []),
+    'product.product': (REMOTE_PRODUCT_FIELDS, []),
+    'hotel.virtual.room': (['product_id'], []),
+    'hotel.room': (['product_id'], []),
+    'hotel.room.amenities': (['product_tmpl_id'], []),
+    'res.users': (['login'], []),
+    'res.partner.category': (['name', 'parent_id'], []),
+    'wubook.channel.info': (['wid'], []),
+    'account.journal': (['name'], []),
+    'ir.model.data': (['module', 'name', 'model', 'res_id'], [
+        ('model', 'in', ['res.country', 'res.country.state', 'hotel.virtual.room', 'hotel.room']),
+    ]),
+}
+
+
+def migration_stage(stage):
+    """ Record every invocation of the decorated migrated.hotel action in a
+    migrated.run, passed to the stage as `migration_run_id` in the context.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self.ensure_one()
+            cr = self.env.cr
+            run = self.env['migrated.run'].create({
+                'migrated_hotel_id': self.id,
+                'stage': stage,
+                'delta': bool(self._context.get('migration_delta')),
+                'date_start': fields.Datetime.now(),
+            })
+            cr.commit()
+            sql_count = cr.sql_log_count
+            start_time = time.time()
+            state = 'failed'
+            try:
+                result = method(self.with_context(migration_run_id=run.id), *args, **kwargs)
+                state = 'done'
+                return result
+            finally:
+                if state == 'failed':
+                    # keep the batches already committed by the stage and record the failure
+                    cr.rollback()
+                    self.env.clear()
+                # remote calls of the sessions released by the stage, see _release_noderpc()
+                rpc_count, rpc_bytes = pop_run_rpc_stats(run.id)
+                run._add_counts(rpc_count=rpc_count, rpc_bytes=rpc_bytes,
+                                sql_count=cr.sql_log_count - sql_count, peak_rss=current_rss())
+                run._finish(state, time.time() - start_time)
+                cr.commit()
+        return wrapper
+    return decorator
+
 
 class MigratedHotel(models.Model):
     _name = 'migrated.hotel'
@@ -24,13 +182,49 @@ class MigratedHotel(models.Model):
     odoo_protocol = fields.Selection([('jsonrpc+ssl', 'jsonrpc+ssl')],
                                      'Protocol', required=True, default='jsonrpc+ssl')
     odoo_version = fields.Char()
+    odoo_session_pool_size = fields.Integer('Remote Sessions', required=True, default=4,
+                                            help='Maximum number of remote sessions kept open by each server '
+                                                 'process and shared by its migration stages. Parallel '
+                                                 'workers and the stages of Import All run in processes of '
+                                                 'their own, each one logging in its own sessions outside '
+                                                 'this limit.')
+    migration_source = fields.Selection([('remote', 'Remote Node'), ('snapshot', 'Snapshot')],
+                                        'Migration Source', required=True, default='remote',
+                                        help='Read the remote records from the node itself or from '
+                                             'a snapshot exported from it.')
+    snapshot_path = fields.Char('Snapshot Directory',
+                                help='Directory of the server where the snapshot of the remote node '
+                                     'is exported to and replayed from.')
+    snapshot_date = fields.Datetime('Snapshot Date', readonly=True)
 
     migration_date_d = fields.Date('Migration D-date', required=True,
                                    default=fields.Datetime.now())
     migration_before_date_d = fields.Boolean('Migrate data before D-date', default=True)
     migration_date_operator = fields.Char(default='<')
+    migration_workers = fields.Integer('Parallel Workers', required=True, default=1,
+                                       help='Number of processes migrating partners, reservations '
+                                            'and services. Each one uses its own database cursor '
+                                            'and logs in its own remote session, in addition to the '
+                                            'remote sessions of the server process.')
+    migration_batch_size = fields.Integer('Remote Batch Size', required=True, default=500,
+                                          help='Number of remote records fetched per search_read call.')
+    migration_commit_interval = fields.Integer('Commit Interval', required=True, default=100,
+                                               help='Number of migrated records per database commit. '
+                                                    'Each record is migrated in its own savepoint.')
+    migration_prefetch_batches = fields.Integer('Prefetched Batches', required=True, default=2,
+                                                help='Number of remote batches read ahead in a background '
+                                                     'thread while the current one is migrated. '
+                                                     'Set 0 to read them in turn.')
+    migration_parallel_stages = fields.Integer('Parallel Stages', required=True, default=2,
+                                               help='Number of independent stages run at the same time '
+                                                    'by Import All. Each one uses its own database cursor, '
+                                                    'remote session and parallel workers.')
+    migration_schedule_report = fields.Text('Last Import All', readonly=True)
 
     log_ids = fields.One2many('migrated.log', 'migrated_hotel_id')
+    checkpoint_ids = fields.One2many('migrated.checkpoint', 'migrated_hotel_id')
+    mapping_ids = fields.One2many('migrated.mapping', 'migrated_hotel_id')
+    run_ids = fields.One2many('migrated.run', 'migrated_hotel_id')
 
     backend_id = fields.Many2one('channel.backend', require=True)
     dummy_closure_reason_id = fields.Many2one('room.closure.reason', require=True)
@@ -44,9 +238,16 @@ class MigratedHotel(models.Model):
 
     @api.model
     def create(self, vals):
+        if vals.get('migration_source') == 'snapshot':
+            # rehearsals do not need the remote node to be reachable
+            try:
+                vals.update({'odoo_version': load_snapshot(vals['snapshot_path']).version})
+            except (OSError, ValueError, KeyError, TypeError) as err:
+                raise ValidationError(err)
+            return super().create(vals)
         try:
-            noderpc = odoorpc.ODOO(vals['odoo_host'], vals['odoo_protocol'], vals['odoo_port'])
-            noderpc.login(vals['odoo_db'], vals['odoo_user'], vals['odoo_password'])
+            noderpc = connect_remote(vals['odoo_host'], vals['odoo_protocol'], vals['odoo_port'],
+                                     vals['odoo_db'], vals['odoo_user'], vals['odoo_password'])
 
             vals.update({'odoo_version': noderpc.version})
 
@@ -54,11 +255,364 @@ class MigratedHotel(models.Model):
             raise ValidationError(err)
         else:
             hotel_id = super().create(vals)
-            noderpc.logout()
+            # keep the session for the first migration stage
+            hotel_id._get_session_pool().adopt(noderpc)
             return hotel_id
 
     @api.multi
-    def check_vat(self, vat, country_id):
+    def _split_batches(self, remote_ids):
+        batch_size = max(self.migration_batch_size, 1)
+        for index in range(0, len(remote_ids), batch_size):
+            yield remote_ids[index:index + batch_size]
+
+    @api.multi
+    def _remote_search_read(self, noderpc, model, remote_ids, fields=None, domain=None):
+        # one search_read for the whole chunk, returned in the same order as remote_ids
+        if not remote_ids:
+            return []
+        rpc_records = noderpc.env[model].search_read(
+            [('id', 'in', remote_ids)] + (domain or []),
+            fields,
+        )
+        rpc_records_by_id = {x['id']: x for x in rpc_records}
+        return [rpc_records_by_id[x] for x in remote_ids if x in rpc_records_by_id]
+
+    @api.multi
+    def _prefetch_batches(self, remote_ids, fetch, pending_ids=None):
+        # yield (batch_ids, fetch(batch_pending_ids)) with the next batches read in a background
+        # thread, see tools/remote_prefetch.py: fetch may only use the remote session
+        if pending_ids is None:
+            pending_ids = set(remote_ids)
+        return prefetch_batches(
+            self._split_batches(remote_ids),
+            lambda batch_ids: fetch([x for x in batch_ids if x in pending_ids]),
+            max(self.migration_prefetch_batches, 0),
+        )
+
+    @api.multi
+    def _get_session_pool(self):
+        self.ensure_one()
+        return get_session_pool(
+            (self.env.cr.dbname, self.id),
+            self.odoo_host, self.odoo_protocol, self.odoo_port,
+            self.odoo_db, self.odoo_user, self.odoo_password,
+            max(self.odoo_session_pool_size, 1),
+        )
+
+    @api.multi
+    def _acquire_noderpc(self, source=None):
+        # authenticated sessions are reused across stages, see tools/remote_session.py
+        if (source or self.migration_source) == 'snapshot':
+            try:
+                return load_snapshot(self.snapshot_path)
+            except (OSError, ValueError, KeyError, TypeError) as err:
+                raise ValidationError(err)
+        try:
+            noderpc = self._get_session_pool().acquire(timeout=SESSION_ACQUIRE_TIMEOUT)
+        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
+            raise ValidationError(err)
+        # the session is only used by this stage until it is released
+        noderpc._migration_rpc_start = rpc_stats(noderpc)
+        return noderpc
+
+    @api.multi
+    def _release_noderpc(self, noderpc):
+        if not isinstance(noderpc, RemoteSnapshot):
+            calls, rpc_bytes = rpc_stats(noderpc)
+            start_calls, start_bytes = getattr(noderpc, '_migration_rpc_start', (calls, rpc_bytes))
+            add_run_rpc_stats(self._context.get('migration_run_id'), calls - start_calls, rpc_bytes - start_bytes)
+            self._get_session_pool().release(noderpc)
+
+    @api.multi
+    def action_export_snapshot(self):
+        self.ensure_one()
+        if not self.snapshot_path:
+            raise ValidationError('Set the snapshot directory before exporting the remote node.')
+        noderpc = self._acquire_noderpc(source='remote')
+        try:
+            start_time = time.time()
+            counts = export_snapshot(noderpc, self.snapshot_path, SNAPSHOT_MODELS,
+                                     batch_size=max(self.migration_batch_size, 1))
+            self.snapshot_date = fields.Datetime.now()
+            _logger.info('User #%s exported %s remote records to the snapshot %s in %.0fs',
+                         self._uid, sum(counts.values()), self.snapshot_path, time.time() - start_time)
+        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError, OSError) as err:
+            raise ValidationError(err)
+        finally:
+            self._release_noderpc(noderpc)
+
+    @api.multi
+    def _get_checkpoint(self, model):
+        checkpoint = self.checkpoint_ids.filtered(lambda x: x.model == model)
+        if not checkpoint:
+            checkpoint = self.env['migrated.checkpoint'].create({
+                'migrated_hotel_id': self.id,
+                'model': model,
+            })
+        return checkpoint
+
+    @api.multi
+    def action_reset_checkpoints(self):
+        self.ensure_one()
+        self.checkpoint_ids.unlink()
+        # partners of interest are discovered again by the next run
+        self.run_ids.write({'partner_interest_ids': False})
+
+    @api.multi
+    def _partition_remote_ids(self, remote_ids, partition_map_ids=None):
+        # split remote_ids in contiguous ranges, one per worker, keeping together
+        # the remote ids sharing the same key in partition_map_ids (e.g. their folio)
+        workers = max(self.migration_workers, 1)
+        groups = {}
+        for remote_id in remote_ids:
+            key = partition_map_ids and partition_map_ids.get(remote_id) or remote_id
+            groups.setdefault(key, []).append(remote_id)
+        partition_size = -(-len(remote_ids) // workers)
+        partitions = [[]]
+        for key in sorted(groups):
+            if len(partitions[-1]) >= partition_size and len(partitions) < workers:
+                partitions.append([])
+            partitions[-1].extend(groups[key])
+        return [sorted(x) for x in partitions if x]
+
+    @api.multi
+    def _get_remote_write_date(self, noderpc, model):
+        # latest remote write_date before the stage reads its records: the next delta sync starts there
+        rpc_records = noderpc.env[model].with_context(active_test=False).search_read(
+            [], ['write_date'], limit=1, order='write_date DESC')
+        return rpc_records and rpc_records[0]['write_date'] or False
+
+    @api.multi
+    def _delta_remote_ids(self, noderpc, model, remote_ids, checkpoint, resolver, local_model=None):
+        # in a delta sync, only the remote records not migrated yet (e.g. a partner of a new
+        # folio) and the migrated ones written since the last sync of the checkpoint
+        if not self._context.get('migration_delta'):
+            return remote_ids
+        checkpoint._restart()
+        if not checkpoint.sync_write_date:
+            _logger.warning("No previous sync of '%s': all its remote records are migrated again",
+                            checkpoint.model)
+            return remote_ids
+        local_model = local_model or model
+        new_ids = [x for x in remote_ids if not resolver.exists(local_model, x)]
+        migrated_ids = [x for x in remote_ids if resolver.exists(local_model, x)]
+        written_ids = []
+        for remote_batch_ids in self._split_batches(migrated_ids):
+            # records written in the same second as the last sync are taken again
+            written_ids += noderpc.env[model].with_context(active_test=False).search([
+                ('id', 'in', remote_batch_ids),
+                ('write_date', '>=', checkpoint.sync_write_date),
+            ], order='id ASC')
+        _logger.info("Delta sync of '%s': %s of %s remote records not migrated yet, %s written since %s",
+                     checkpoint.model, len(new_ids), len(remote_ids), len(written_ids),
+                     checkpoint.sync_write_date)
+        return sorted(new_ids + written_ids)
+
+    @api.multi
+    def _pending_remote_ids(self, resolver, model, remote_ids, update=True):
+        # remote ids to read: the ones not migrated yet and, in a delta sync, the migrated ones
+        # to update (merged partners are left as they are)
+        if not self._context.get('migration_delta'):
+            return {x for x in remote_ids if not resolver.exists(model, x)}
+        if update:
+            return {x for x in remote_ids if resolver.get(model, x) or not resolver.exists(model, x)}
+        pending_ids = {x for x in remote_ids if not resolver.exists(model, x)}
+        if len(pending_ids) < len(remote_ids):
+            _logger.info("Delta sync of '%s': %s changed remote records already migrated are not updated",
+                         model, len(remote_ids) - len(pending_ids))
+        return pending_ids
+
+    @api.multi
+    def _create_or_update(self, model, vals, resolver, context=None):
+        # in a delta sync, records already migrated are written with their new remote values
+        res_id = resolver.get(model, vals['remote_id'])
+        records = self.env[model].with_context(context or {})
+        if not res_id:
+            return records.create(vals)
+        record = records.browse(res_id)
+        update_vals = dict(vals)
+        for name, value in vals.items():
+            if not (isinstance(value, list) and value and all(isinstance(x, (list, tuple)) and x[0] == 0
+                                                              for x in value)):
+                continue
+            key = UPDATE_LINE_KEYS.get((model, name))
+            if not key:
+                # lines that cannot be matched are left as they are, instead of being added again
+                del update_vals[name]
+                continue
+            lines = {line[key]: line for line in record[name]}
+            commands = []
+            for command in value:
+                line = lines.pop(command[2][key], None)
+                commands.append((1, line.id, command[2]) if line else command)
+            update_vals[name] = [(2, x.id) for x in lines.values()] + commands
+        record.write(update_vals)
+        return record
+
+    @api.multi
+    def _migrate_in_workers(self, method_name, model_log_code, noderpc, resolver, checkpoint,
+                            remote_ids, args=(), partition_map_ids=None, sync_write_date=None):
+        remote_ids = checkpoint._resume_remote_ids(remote_ids)
+        if self.migration_workers <= 1 or len(remote_ids) < 2:
+            getattr(self, method_name)(noderpc, resolver, checkpoint, remote_ids, *args)
+            checkpoint._set_done(sync_write_date)
+            return
+
+        partitions = self._partition_remote_ids(remote_ids, partition_map_ids)
+        _logger.info("Launching %s workers for '%s' with %s remote ids...",
+                     len(partitions), method_name, len(remote_ids))
+        # workers use their own cursor, so they only see what is already committed
+        self.env.cr.commit()
+        start_time = time.time()
+        results = run_in_workers(self, method_name, partitions, args)
+        exit_codes = [exit_code for exit_code, dummy in results]
+        for partition, exit_code in zip(partitions, exit_codes):
+            if exit_code:
+                migrated_log = self.env['migrated.log'].create({
+                    'name': 'Worker for remote IDs [%s..%s] exited with code %s' % (
+                        partition[0], partition[-1], exit_code),
+                    'date_time': fields.Datetime.now(),
+                    'migrated_hotel_id': self.id,
+                    'model': model_log_code,
+                    'remote_id': partition[0],
+                })
+                _logger.error("Worker '%s' for remote IDs [%s..%s] failed with LOG #%s",
+                              method_name, partition[0], partition[-1], migrated_log.id)
+        _logger.info("Workers for '%s' finished in %.2fs", method_name, time.time() - start_time)
+        # forked workers share the pages of this process, so the largest one is the stage peak
+        checkpoint._update_peak_rss(max(rss for dummy, rss in results))
+        # records created by the workers are not known by this process yet
+        resolver.invalidate()
+        # workers do not move the checkpoint because their ranges are migrated concurrently
+        if not any(exit_codes):
+            checkpoint._commit_batch(remote_ids)
+            checkpoint._set_done(sync_write_date)
+        else:
+            self.env.cr.commit()
+
+    @api.multi
+    def _build_res_users_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'res.users' ids...")
+        remote_records = noderpc.env['res.users'].search_read([], ['login'])
+        res_users_ids = {}
+        for record in self.env['res.users'].search_read(
+                [('login', 'in', [x['login'] for x in remote_records])], ['login']):
+            res_users_ids.setdefault(record['login'], record['id'])
+        default_res_users_id = self._context.get('uid', self._uid)
+        return {x['id']: res_users_ids.get(x['login'], default_res_users_id) for x in remote_records}
+
+    @api.multi
+    def _build_category_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'res.partner.category' ids...")
+        # categories are matched by their name and the name of their parent
+        def category_keys(records):
+            names = {x['id']: x['name'] for x in records}
+            return [((x['name'], x['parent_id'] and names.get(x['parent_id'][0]) or False), x['id'])
+                    for x in records]
+
+        remote_records = noderpc.env['res.partner.category'].search_read([], ['name', 'parent_id'])
+        res_partner_category_ids = {}
+        for key, res_id in category_keys(self.env['res.partner.category'].search_read([], ['name', 'parent_id'])):
+            res_partner_category_ids.setdefault(key, res_id)
+        return {remote_id: res_partner_category_ids.get(key, False)
+                for key, remote_id in category_keys(remote_records)}
+
+    @api.multi
+    def _get_xmlid_map_ids(self, noderpc, remote_model, model=None):
+        # remote ids of remote_model to the local ids of model sharing their external id,
+        # with one remote search_read and one local query for the whole model
+        model = model or remote_model
+        remote_xmlids = noderpc.env['ir.model.data'].search_read(
+            [('model', '=', remote_model)],
+            ['module', 'name', 'res_id'],
+            order='id ASC',
+        )
+        self.env.cr.execute('''SELECT module, name, res_id FROM ir_model_data
+                               WHERE model = %s ORDER BY id''', (model,))
+        local_ids = {}
+        for module, name, res_id in self.env.cr.fetchall():
+            local_ids.setdefault((module, name), res_id)
+        map_ids = {}
+        for remote_xmlid in remote_xmlids:
+            res_id = local_ids.get((remote_xmlid['module'], remote_xmlid['name']))
+            if res_id:
+                map_ids.setdefault(remote_xmlid['res_id'], res_id)
+        return map_ids
+
+    @api.multi
+    def _build_country_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'res.country' ids...")
+        # Known Issue: res.country base.an, base.nt, base.tp, base.yu, base.zr are not
+        # migrated from Odoo version 10 to version 11
+        return self._get_xmlid_map_ids(noderpc, 'res.country')
+
+    @api.multi
+    def _build_country_state_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'res.country.state' ids...")
+        return self._get_xmlid_map_ids(noderpc, 'res.country.state')
+
+    @api.multi
+    def _build_room_type_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'hotel.room.type' ids...")
+        return self._get_xmlid_map_ids(noderpc, 'hotel.virtual.room', 'hotel.room.type')
+
+    @api.multi
+    def _build_room_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'hotel.room' ids...")
+        # rooms are referenced by their remote product
+        room_ids = self._get_xmlid_map_ids(noderpc, 'hotel.room')
+        remote_hotel_rooms = noderpc.env['hotel.room'].search_read(
+            [('id', 'in', list(room_ids))],
+            ['product_id']
+        )
+        room_map_ids = {}
+        for remote_hotel_room in remote_hotel_rooms:
+            if remote_hotel_room['product_id']:
+                room_map_ids.update({remote_hotel_room['product_id'][0]: room_ids[remote_hotel_room['id']]})
+        return room_map_ids
+
+    @api.multi
+    def _build_ota_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'channel.ota.info' ids...")
+        remote_records = noderpc.env['wubook.channel.info'].search_read([], ['wid'])
+        res_ota_ids = {}
+        for record in self.env['channel.ota.info'].search_read([], ['ota_id']):
+            if record['ota_id']:
+                res_ota_ids.setdefault(int(record['ota_id']), record['id'])
+        return {x['id']: res_ota_ids.get(int(x['wid']), False) for x in remote_records}
+
+    @api.multi
+    def _build_journal_map_ids(self, noderpc):
+        _logger.info("Mapping local with remote 'account.journal' ids...")
+        remote_records = noderpc.env['account.journal'].search_read([], ['name'])
+        res_journal_ids = {}
+        for record in self.env['account.journal'].search_read(
+                [('name', 'in', [x['name'] for x in remote_records])], ['name']):
+            res_journal_ids.setdefault(record['name'], record['id'])
+        return {x['id']: res_journal_ids.get(x['name'], False) for x in remote_records}
+
+    @api.multi
+    def _get_map_ids(self, model, noderpc):
+        # reference maps are computed once per remote node and stored until invalidated
+        self.env.cr.execute('''SELECT remote_id, res_id FROM migrated_mapping
+                               WHERE migrated_hotel_id = %s AND model = %s''',
+                            (self.id, model))
+        map_ids = dict(self.env.cr.fetchall())
+        if map_ids:
+            return map_ids
+
+        map_ids = getattr(self, MAPPING_BUILDERS[model])(noderpc)
+        if map_ids:
+            self.env['migrated.mapping']._store_map_ids(self, model, map_ids)
+        return map_ids
+
+    @api.multi
+    def action_invalidate_mappings(self):
+        self.ensure_one()
+        self.mapping_ids.unlink()
+
+    @api.multi
+    def check_vat(self, vat, country_id, country_code=None):
         res_partner = self.env['res.partner']
         # quick and partial off-line checksum validation
         check_func = res_partner.simple_vat_check
@@ -66,7 +620,7 @@ class MigratedHotel(models.Model):
         vat_country, vat_number = res_partner._split_vat(vat)
         if not check_func(vat_country, vat_number):
             # if fails, check with country code from country
-            country_code = self.env['res.country'].browse(country_id).code
+            country_code = country_code or self.env['res.country'].browse(country_id).code
             if country_code:
                 if not check_func(country_code.lower(), vat):
                     return False
@@ -76,7 +630,8 @@ class MigratedHotel(models.Model):
 
     @api.multi
     def _prepare_partner_remote_data(self, rpc_res_partner, country_map_ids,
-                                     country_state_map_ids, category_map_ids):
+                                     country_state_map_ids, category_map_ids, resolver, log_buffer,
+                                     vat_cache=None):
         # prepare country_id related field
         remote_id = rpc_res_partner['country_id'] and rpc_res_partner['country_id'][0]
         country_id = remote_id and country_map_ids.get(remote_id) or None
@@ -90,23 +645,16 @@ class MigratedHotel(models.Model):
         parent_id = rpc_res_partner['parent_id']
         vat = rpc_res_partner['vat']
         if parent_id:
-            parent_id = self.env['res.partner'].search([
-                ('remote_id', '=', parent_id[0])
-            ]).id
+            parent_id = resolver.get('res.partner', parent_id[0])
             vat = ''
 
         comment = rpc_res_partner['comment'] or ''
-        if vat and not self.check_vat(vat, country_id):
+        valid_vat = vat and (vat_cache.check(vat, country_id) if vat_cache else self.check_vat(vat, country_id))
+        if vat and not valid_vat:
             check_vat_msg = 'Invalid VAT number ' + vat + ' for this partner ' + rpc_res_partner['name']
-            migrated_log = self.env['migrated.log'].create({
-                'name': check_vat_msg,
-                'date_time': fields.Datetime.now(),
-                'migrated_hotel_id': self.id,
-                'model': 'partner',
-                'remote_id': rpc_res_partner['id'],
-            })
-            _logger.warning('res.partner with ID remote: [%s] LOG #%s: (%s)',
-                            rpc_res_partner['id'], migrated_log.id, check_vat_msg)
+            log_buffer.add('partner', rpc_res_partner['id'], check_vat_msg)
+            _logger.warning('res.partner with ID remote: [%s]: (%s)',
+                            rpc_res_partner['id'], check_vat_msg)
             comment = check_vat_msg + "\n" + comment
             vat = False
 
@@ -143,94 +691,121 @@ class MigratedHotel(models.Model):
         }
 
     @api.multi
-    def action_migrate_partners(self):
-        self.ensure_one()
+    def _migrate_partner_ids(self, noderpc, resolver, checkpoint, remote_partner_ids, country_map_ids,
+                             country_state_map_ids, category_map_ids):
+        # disable mail feature to speed-up migration
+        context_no_mail = {
+            'tracking_disable': True,
+            'mail_notrack': True,
+            'mail_create_nolog': True,
+        }
+        log_buffer = MigratedLogBuffer(self)
+        vat_cache = VatCheckCache(self)
+        batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+
+        def fetch(remote_ids):
+            return self._remote_search_read(
+                noderpc, 'res.partner', remote_ids, REMOTE_PARTNER_FIELDS,
+                ['|', ('active', '=', True), ('active', '=', False)],
+            )
 
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        pending_ids = self._pending_remote_ids(resolver, 'res.partner', remote_partner_ids)
+        for remote_res_partner_batch_ids, rpc_res_partners in self._prefetch_batches(
+                remote_partner_ids, fetch, pending_ids):
+            for rpc_res_partner in rpc_res_partners:
+                remote_res_partner_id = rpc_res_partner['id']
+                try:
+                    _logger.info('User #%s started migration of res.partner with remote ID: [%s]',
+                                 self._uid, remote_res_partner_id)
 
-        try:
-            # prepare res.country ids
-            _logger.info("Mapping local with remote 'res.country' ids...")
-            remote_ids = noderpc.env['res.country'].search([])
-            remote_xml_ids = noderpc.env['res.country'].browse(
-                remote_ids).get_external_id()
-            country_map_ids = {}
-            for key, value in remote_xml_ids.items():
-                # Known Issue: res.country base.an, base.nt, base.tp, base.yu, base.zr are not
-                # migrated from Odoo version 10 to version 11
-                res_country_id = self.env['ir.model.data'].xmlid_to_res_id(value)
-                country_map_ids.update({int(key): res_country_id})
-
-            # prepare res.country.state ids
-            _logger.info("Mapping local with remote 'res.country.state' ids...")
-            remote_ids = noderpc.env['res.country.state'].search([])
-            remote_xml_ids = noderpc.env['res.country.state'].browse(
-                remote_ids).get_external_id()
-            country_state_map_ids = {}
-            for key, value in remote_xml_ids.items():
-                res_country_state_id = self.env['ir.model.data'].xmlid_to_res_id(value)
-                country_state_map_ids.update({int(key): res_country_state_id})
-
-            # prepare res.partner.category ids
-            _logger.info("Mapping local with remote 'res.partner.category' ids...")
-            remote_ids = noderpc.env['res.partner.category'].search([])
-            remote_records = noderpc.env['res.partner.category'].browse(remote_ids)
-            category_map_ids = {}
-            for record in remote_records:
-                res_partner_category_id = self.env['res.partner.category'].search([
-                    ('name', '=', record.name),
-                    ('parent_id.name', '=', record.parent_id.name),
-                ]).id
-                category_map_ids.update({record.id: res_partner_category_id})
-
-            # prepare partners of interest
-            _logger.info("Preparing 'res.partners' of interest...")
-
-            folio_ids = noderpc.env['hotel.folio'].search_read(
-                [],
-                ['partner_id']
-            )
-            partners_folios_set = []
-            if folio_ids:
-                partners_folios_set = [x['partner_id'][0] for x in folio_ids]
+                    with batcher.record(remote_res_partner_id):
+                        vals = self._prepare_partner_remote_data(
+                            rpc_res_partner,
+                            country_map_ids,
+                            country_state_map_ids,
+                            category_map_ids,
+                            resolver,
+                            log_buffer,
+                            vat_cache,
+                        )
+                        migrated_res_partner = self._create_or_update('res.partner', vals, resolver, context_no_mail)
+                    resolver.add('res.partner', remote_res_partner_id, migrated_res_partner.id)
 
-            cardex_ids = noderpc.env['cardex'].search_read(
-                [],
-                ['partner_id']
-            )
-            partners_cardex_set = []
-            if cardex_ids:
-                partners_cardex_set = [x['partner_id'][0] for x in cardex_ids]
+                    _logger.info('User #%s migrated res.partner with ID [local, remote]: [%s, %s]',
+                                 self._uid, migrated_res_partner.id, remote_res_partner_id)
 
-            payment_ids = noderpc.env['account.payment'].search_read(
-                [],
-                ['partner_id']
-            )
-            partners_payment_set = []
-            if payment_ids:
-                partners_payment_set = [x['partner_id'][0] for x in payment_ids]
+                except (ValueError, ValidationError, Exception) as err:
+                    log_buffer.add('partner', remote_res_partner_id, err)
+                    _logger.error('res.partner with ID remote: [%s]: (%s)',
+                                  remote_res_partner_id, err)
+                    continue
 
-            invoice_ids = noderpc.env['account.invoice'].search_read(
-                [],
-                ['partner_id']
+            batcher.mark_batch(remote_res_partner_batch_ids)
+        batcher.run._add_counts(**vat_cache.counters)
+        batcher.commit()
+        _logger.info('VAT cache hit rate: %.0f%%', vat_cache.hit_rate() * 100)
+
+    @api.multi
+    def _read_grouped_partner_ids(self, noderpc, model, max_partner_id):
+        # distinct partners referenced by the remote model, grouped by the remote server over
+        # ranges of partner ids: groups are sorted by partner name, so they cannot be paged
+        partner_ids = set()
+        for start_id in range(1, max_partner_id + 1, PARTNER_INTEREST_PAGE_SIZE):
+            groups = noderpc.env[model].read_group(
+                [('partner_id', '>=', start_id), ('partner_id', '<', start_id + PARTNER_INTEREST_PAGE_SIZE)],
+                ['partner_id'], ['partner_id'],
             )
-            partners_invoice_set = []
-            if invoice_ids:
-                partners_invoice_set = [x['partner_id'][0] for x in invoice_ids]
+            partner_ids.update(x['partner_id'][0] for x in groups if x['partner_id'])
+        return partner_ids
+
+    @api.multi
+    def _get_partner_interest_ids(self, noderpc):
+        self.ensure_one()
+        remote_partner_set_ids = None
+        # only an interrupted migration of partners is resumed with the partners it was looking for:
+        # a new one (or a delta sync) looks for the partners of the records created since then
+        interrupted = self.checkpoint_ids.filtered(
+            lambda x: x.model in ('partner', 'partner_contact') and x.state == 'running' and x.last_remote_id)
+        if interrupted and not self._context.get('migration_delta'):
+            remote_partner_set_ids = self.env['migrated.run']._find_partner_interest_ids(self)
+        if remote_partner_set_ids is not None:
+            _logger.info("Reusing %s 'res.partners' of interest of a previous run...",
+                         len(remote_partner_set_ids))
+            return remote_partner_set_ids
+
+        _logger.info("Preparing 'res.partners' of interest...")
+        remote_partner_set_ids = set()
+        max_partner_id = noderpc.env['res.partner'].with_context(active_test=False).search(
+            [], limit=1, order='id DESC')
+        for model in PARTNER_INTEREST_MODELS:
+            remote_partner_set_ids |= self._read_grouped_partner_ids(
+                noderpc, model, max_partner_id and max_partner_id[0] or 0)
+        remote_partner_set_ids = sorted(remote_partner_set_ids)
+        run = self.env['migrated.run'].browse(self._context.get('migration_run_id'))
+        if run:
+            run._store_partner_interest_ids(remote_partner_set_ids)
+            self.env.cr.commit()
+        return remote_partner_set_ids
+
+    @api.multi
+    @migration_stage('partners')
+    def action_migrate_partners(self):
+        self.ensure_one()
+
+        noderpc = self._acquire_noderpc()
+
+        try:
+            # prepare reference ids
+            country_map_ids = self._get_map_ids('res.country', noderpc)
+            country_state_map_ids = self._get_map_ids('res.country.state', noderpc)
+            category_map_ids = self._get_map_ids('res.partner.category', noderpc)
 
             # set of remote partners of interest
-            remote_partner_set_ids = list(set().union(
-                partners_folios_set,
-                partners_cardex_set,
-                partners_payment_set,
-                partners_invoice_set,
-            ))
+            remote_partner_set_ids = self._get_partner_interest_ids(noderpc)
+            sync_write_date = self._get_remote_write_date(noderpc, 'res.partner')
             # First, import remote partners without contacts (parent_id is not set)
             _logger.info("Migrating 'res.partners' without parent_id...")
+            checkpoint = self._get_checkpoint('partner')
             remote_partner_ids = noderpc.env['res.partner'].search([
                 ('id', 'in', remote_partner_set_ids),
                 ('parent_id', '=', False),
@@ -238,54 +813,17 @@ class MigratedHotel(models.Model):
                 ('create_date', self.migration_date_operator, self.migration_date_d),
                 '|', ('active', '=', True), ('active', '=', False),
             ], order='id ASC')
-            # disable mail feature to speed-up migration
-            context_no_mail = {
-                'tracking_disable': True,
-                'mail_notrack': True,
-                'mail_create_nolog': True,
-            }
-            for remote_res_partner_id in remote_partner_ids:
-                try:
-                    migrated_res_partner = self.env['res.partner'].search([
-                        ('remote_id', '=', remote_res_partner_id),
-                        '|', ('active', '=', True), ('active', '=', False),
-                    ]) or None
-
-                    if not migrated_res_partner:
-                        _logger.info('User #%s started migration of res.partner with remote ID: [%s]',
-                                     self._uid, remote_res_partner_id)
-
-                        rpc_res_partner = noderpc.env['res.partner'].search_read([
-                            ('id', '=', remote_res_partner_id),
-                            '|', ('active', '=', True), ('active', '=', False),
-                        ])[0]
-                        vals = self._prepare_partner_remote_data(
-                            rpc_res_partner,
-                            country_map_ids,
-                            country_state_map_ids,
-                            category_map_ids,
-                        )
-                        migrated_res_partner = self.env['res.partner'].with_context(
-                                context_no_mail
-                            ).create(vals)
-
-                        _logger.info('User #%s migrated res.partner with ID [local, remote]: [%s, %s]',
-                                     self._uid, migrated_res_partner.id, remote_res_partner_id)
-
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'partner',
-                        'remote_id': remote_res_partner_id,
-                    })
-                    _logger.error('res.partner with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_res_partner_id, migrated_log.id, err)
-                    continue
+            resolver = RemoteIdResolver(self.env)
+            remote_partner_ids = self._delta_remote_ids(noderpc, 'res.partner', remote_partner_ids, checkpoint,
+                                                        resolver)
+            self._migrate_in_workers(
+                '_migrate_partner_ids', 'partner', noderpc, resolver, checkpoint,
+                remote_partner_ids, (country_map_ids, country_state_map_ids, category_map_ids),
+                sync_write_date=sync_write_date)
 
             # Second, import remote partners with contacts (already created in the previous step)
             _logger.info("Migrating 'res.partners' with parent_id...")
+            checkpoint = self._get_checkpoint('partner_contact')
             remote_partner_ids = noderpc.env['res.partner'].search([
                 ('id', 'in', remote_partner_set_ids),
                 ('parent_id', '!=', False),
@@ -293,59 +831,23 @@ class MigratedHotel(models.Model):
                 ('create_date', self.migration_date_operator, self.migration_date_d),
                 '|', ('active', '=', True), ('active', '=', False),
             ], order='id ASC')
-            for remote_res_partner_id in remote_partner_ids:
-                try:
-                    migrated_res_partner = self.env['res.partner'].search([
-                        ('remote_id', '=', remote_res_partner_id),
-                        '|', ('active', '=', True), ('active', '=', False),
-                    ]) or None
-
-                    if not migrated_res_partner:
-                        _logger.info('User #%s started migration of res.partner with remote ID: [%s]',
-                                     self._uid, remote_res_partner_id)
-
-                        rpc_res_partner = noderpc.env['res.partner'].search_read([
-                            ('id', '=', remote_res_partner_id),
-                            '|', ('active', '=', True), ('active', '=', False),
-                        ])[0]
-                        vals = self._prepare_partner_remote_data(
-                            rpc_res_partner,
-                            country_map_ids,
-                            country_state_map_ids,
-                            category_map_ids,
-                        )
-                        migrated_res_partner = self.env['res.partner'].with_context(
-                                context_no_mail
-                            ).create(vals)
-
-                        _logger.info('User #%s migrated res.partner with ID [local, remote]: [%s, %s]',
-                                     self._uid, migrated_res_partner.id, remote_res_partner_id)
-
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'partner',
-                        'remote_id': remote_res_partner_id,
-                    })
-                    _logger.error('res.partner with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_res_partner_id, migrated_log.id, err)
-                    continue
+            remote_partner_ids = self._delta_remote_ids(noderpc, 'res.partner', remote_partner_ids, checkpoint,
+                                                        resolver)
+            self._migrate_in_workers(
+                '_migrate_partner_ids', 'partner', noderpc, resolver, checkpoint,
+                remote_partner_ids, (country_map_ids, country_state_map_ids, category_map_ids),
+                sync_write_date=sync_write_date)
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
+    @migration_stage('products')
     def action_migrate_products(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
             # prepare products of interest
@@ -376,91 +878,77 @@ class MigratedHotel(models.Model):
             remote_product_ids = noderpc.env['product.product'].search([
                 ('id', 'not in', remote_products_set_ids),
                 '|', ('active', '=', True), ('active', '=', False)
-            ])
+            ], order='id ASC')
             # disable mail feature to speed-up migration
             context_no_mail = {
                 'tracking_disable': True,
                 'mail_notrack': True,
                 'mail_create_nolog': True,
             }
-            for remote_product_id in remote_product_ids:
-                try:
-                    migrated_product = self.env['product.product'].search([
-                        ('remote_id', '=', remote_product_id)
-                    ]) or None
-
-                    if not migrated_product:
+            resolver = RemoteIdResolver(self.env)
+            log_buffer = MigratedLogBuffer(self)
+            batcher = TransactionBatcher(self.env, self.env['migrated.checkpoint'],
+                                         self.migration_commit_interval, log_buffer)
+
+            def fetch(remote_ids):
+                return self._remote_search_read(
+                    noderpc, 'product.product', remote_ids, REMOTE_PRODUCT_FIELDS,
+                    ['|', ('active', '=', True), ('active', '=', False)],
+                )
+
+            pending_ids = {x for x in remote_product_ids if not resolver.exists('product.product', x)}
+            for remote_product_batch_ids, rpc_products in self._prefetch_batches(
+                    remote_product_ids, fetch, pending_ids):
+                for rpc_product in rpc_products:
+                    remote_product_id = rpc_product['id']
+                    try:
                         _logger.info('User #%s started migration of product.product with remote ID: [%s]',
                                      self._uid, remote_product_id)
 
-                        rpc_product = noderpc.env['product.product'].browse(remote_product_id)
-
-                        vals = {
-                            'remote_id': remote_product_id,
-                            'name': rpc_product.name,
-                            'taxes_id': [[6, False, [rpc_product.taxes_id.id or 59]]],  # 10% (services) as default
-                            'list_price': rpc_product.list_price,
-                            'type': 'service',
-                            'sale_ok': True,
-                            'purchase_ok': False,
-                            'active': True,
-                        }
-                        migrated_product = self.env['product.product'].with_context(
-                            context_no_mail
-                        ).create(vals)
+                        with batcher.record(remote_product_id):
+                            vals = {
+                                'remote_id': remote_product_id,
+                                'name': rpc_product['name'],
+                                # 10% (services) as default
+                                'taxes_id': [[6, False, [rpc_product['taxes_id'] and rpc_product['taxes_id'][0] or 59]]],
+                                'list_price': rpc_product['list_price'],
+                                'type': 'service',
+                                'sale_ok': True,
+                                'purchase_ok': False,
+                                'active': True,
+                            }
+                            migrated_product = self.env['product.product'].with_context(
+                                context_no_mail
+                            ).create(vals)
+                        resolver.add('product.product', remote_product_id, migrated_product.id)
                         #
                         _logger.info('User #%s migrated product.product with ID [local, remote]: [%s, %s]',
                                      self._uid, migrated_product.id, remote_product_id)
 
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'product',
-                        'remote_id': remote_product_id,
-                    })
-                    _logger.error('product.product with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_product_id, migrated_log.id, err)
-                    continue
+                    except (ValueError, ValidationError, Exception) as err:
+                        log_buffer.add('product', remote_product_id, err)
+                        _logger.error('product.product with ID remote: [%s]: (%s)',
+                                      remote_product_id, err)
+                        continue
+
+                batcher.mark_batch(remote_product_batch_ids)
+            batcher.commit()
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
     def _prepare_folio_remote_data(self, rpc_hotel_folio,
-                                   res_users_map_ids, category_map_ids):
-        # prepare partner_id related field
-        default_res_partner = self.env['res.partner'].search([
-            ('user_ids', 'in', self._context.get('uid', self._uid))
-        ])
-        # search res_partner id
+                                   res_users_map_ids, category_map_ids, resolver):
+        # search res_partner id (taking into account merged partners are not active)
         remote_id = rpc_hotel_folio['partner_id'] and rpc_hotel_folio['partner_id'][0]
-        res_partner_id = self.env['res.partner'].search([
-            ('remote_id', '=', remote_id)
-        ]).id or None
-        # take into account merged partners are not active
-        if not res_partner_id:
-            res_partner_id = self.env['res.partner'].search([
-                ('remote_id', '=', remote_id),
-                ('active', '=', False)
-            ]).main_partner_id.id or None
-        res_partner_id = res_partner_id or default_res_partner.id
-
-        # search res_partner invoice id
+        res_partner_id = resolver.final_partner(remote_id)
+
+        # search res_partner invoice id (taking into account merged partners are not active)
         remote_id = rpc_hotel_folio['partner_invoice_id'] and rpc_hotel_folio['partner_invoice_id'][0]
-        res_partner_invoice_id = self.env['res.partner'].search([
-            ('remote_id', '=', remote_id)
-        ]).id or None
-        # take into account merged partners are not active
-        if not res_partner_invoice_id:
-            res_partner_invoice_id = self.env['res.partner'].search([
-                ('remote_id', '=', remote_id),
-                ('active', '=', False)
-            ]).main_partner_id.id or None
-        res_partner_invoice_id = res_partner_invoice_id or default_res_partner.company_id.id
+        res_partner_invoice_id = resolver.final_partner(remote_id, company=True)
 
         # search res_users ids
         remote_id = rpc_hotel_folio['user_id'] and rpc_hotel_folio['user_id'][0]
@@ -501,40 +989,19 @@ class MigratedHotel(models.Model):
         return vals
 
     @api.multi
+    @migration_stage('folios')
     def action_migrate_folios(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
-            # prepare res.users ids
-            _logger.info("Mapping local with remote 'res.users' ids...")
-            remote_ids = noderpc.env['res.users'].search([])
-            remote_records = noderpc.env['res.users'].browse(remote_ids)
-            res_users_map_ids = {}
-            for record in remote_records:
-                res_users_id = self.env['res.users'].search([
-                    ('login', '=', record.login),
-                ]).id or self._context.get('uid', self._uid)
-                res_users_map_ids.update({record.id: res_users_id})
-
-            # prepare res.partner.category ids
-            _logger.info("Mapping local with remote 'res.partner.category' ids...")
-            remote_ids = noderpc.env['res.partner.category'].search([])
-            remote_records = noderpc.env['res.partner.category'].browse(remote_ids)
-            category_map_ids = {}
-            for record in remote_records:
-                res_partner_category_id = self.env['res.partner.category'].search([
-                    ('name', '=', record.name),
-                    ('parent_id.name', '=', record.parent_id.name),
-                ]).id
-                category_map_ids.update({record.id: res_partner_category_id})
+            # prepare reference ids
+            res_users_map_ids = self._get_map_ids('res.users', noderpc)
+            category_map_ids = self._get_map_ids('res.partner.category', noderpc)
 
             # prepare folios of interest
             _logger.info("Preparing 'hotel.folio' of interest...")
+            sync_write_date = self._get_remote_write_date(noderpc, 'hotel.folio')
             remote_hotel_reservation_ids = noderpc.env['hotel.reservation'].search_read(
                 [('checkout', self.migration_date_operator, self.migration_date_d)],
                 ['folio_id']
@@ -550,6 +1017,13 @@ class MigratedHotel(models.Model):
                 remote_hotel_folio_ids = list(set().union(
                     remote_hotel_folio_ids, remote_hotel_folio_extra_ids
                 ))
+            # ascending order allows resuming from the last committed batch
+            remote_hotel_folio_ids.sort()
+            checkpoint = self._get_checkpoint('folio')
+            resolver = RemoteIdResolver(self.env)
+            remote_hotel_folio_ids = self._delta_remote_ids(noderpc, 'hotel.folio', remote_hotel_folio_ids,
+                                                            checkpoint, resolver)
+            remote_hotel_folio_ids = checkpoint._resume_remote_ids(remote_hotel_folio_ids)
 
             _logger.info("Migrating 'hotel.folio'...")
             # disable mail feature to speed-up migration
@@ -558,57 +1032,54 @@ class MigratedHotel(models.Model):
                 'mail_notrack': True,
                 'mail_create_nolog': True,
             }
-            for remote_hotel_folio_id in remote_hotel_folio_ids:
-                try:
-                    migrated_hotel_folio = self.env['hotel.folio'].search([
-                        ('remote_id', '=', remote_hotel_folio_id)
-                    ]) or None
-
-                    if not migrated_hotel_folio:
+            log_buffer = MigratedLogBuffer(self)
+            batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+
+            def fetch(remote_ids):
+                return self._remote_search_read(noderpc, 'hotel.folio', remote_ids, REMOTE_FOLIO_FIELDS)
+
+            pending_ids = self._pending_remote_ids(resolver, 'hotel.folio', remote_hotel_folio_ids)
+            for remote_hotel_folio_batch_ids, rpc_hotel_folios in self._prefetch_batches(
+                    remote_hotel_folio_ids, fetch, pending_ids):
+                for rpc_hotel_folio in rpc_hotel_folios:
+                    remote_hotel_folio_id = rpc_hotel_folio['id']
+                    try:
                         _logger.info('User #%s started migration of hotel.folio with remote ID: [%s]',
                                      self._uid, remote_hotel_folio_id)
 
-                        rpc_hotel_folio = noderpc.env['hotel.folio'].search_read(
-                            [('id', '=', remote_hotel_folio_id)],
-                        )[0]
-
-                        vals = self._prepare_folio_remote_data(
-                            rpc_hotel_folio,
-                            res_users_map_ids,
-                            category_map_ids)
-                        migrated_hotel_folio = self.env['hotel.folio'].with_context(
-                            context_no_mail
-                        ).create(vals)
+                        with batcher.record(remote_hotel_folio_id):
+                            vals = self._prepare_folio_remote_data(
+                                rpc_hotel_folio,
+                                res_users_map_ids,
+                                category_map_ids,
+                                resolver)
+                            migrated_hotel_folio = self._create_or_update('hotel.folio', vals, resolver,
+                                                                          context_no_mail)
+                        resolver.add('hotel.folio', remote_hotel_folio_id, migrated_hotel_folio.id)
 
                         _logger.info('User #%s migrated hotel.folio with ID [local, remote]: [%s, %s]',
                                      self._uid, migrated_hotel_folio.id, remote_hotel_folio_id)
 
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'folio',
-                        'remote_id': remote_hotel_folio_id,
-                    })
-                    _logger.error('hotel.folio with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_hotel_folio_id, migrated_log.id, err)
-                    continue
+                    except (ValueError, ValidationError, Exception) as err:
+                        log_buffer.add('folio', remote_hotel_folio_id, err)
+                        _logger.error('hotel.folio with ID remote: [%s]: (%s)',
+                                      remote_hotel_folio_id, err)
+                        continue
+
+                batcher.mark_batch(remote_hotel_folio_batch_ids)
+            batcher.commit()
+            checkpoint._set_done(sync_write_date)
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
     def _prepare_reservation_remote_data(self, folio_id, reservation, res_users_map_ids,
-                                         room_type_map_ids, room_map_ids, ota_map_ids, noderpc):
+                                         room_type_map_ids, room_map_ids, ota_map_ids,
+                                         hotel_reservation_lines, resolver):
 
-        remote_ids = reservation['reservation_lines'] and reservation['reservation_lines']
-        hotel_reservation_lines = noderpc.env['hotel.reservation.line'].search_read(
-            [('id', 'in', remote_ids)],
-            ['date', 'price']
-        )
         reservation_line_cmds = []
         for reservation_line in hotel_reservation_lines:
             reservation_line_cmds.append((0, False, {
@@ -663,9 +1134,7 @@ class MigratedHotel(models.Model):
             'last_updated_res': reservation['last_updated_res'],
         }
         if reservation['parent_reservation']:
-            parent_reservation_id = self.env['hotel.reservation'].search([
-                ('remote_id', '=', reservation['parent_reservation'][0])
-            ]).id or None
+            parent_reservation_id = resolver.get('hotel.reservation', reservation['parent_reservation'][0])
             vals.update({'parent_reservation': parent_reservation_id})
 
         if reservation['channel_type'] == 'web':
@@ -684,122 +1153,50 @@ class MigratedHotel(models.Model):
         return vals
 
     @api.multi
-    def action_migrate_reservations(self):
-        self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
-
-        try:
-            # prepare res.users ids
-            _logger.info("Mapping local with remote 'res.users' ids...")
-            remote_ids = noderpc.env['res.users'].search([])
-            remote_records = noderpc.env['res.users'].browse(remote_ids)
-            res_users_map_ids = {}
-            for record in remote_records:
-                res_users_id = self.env['res.users'].search([
-                    ('login', '=', record.login),
-                ]).id or self._context.get('uid', self._uid)
-                res_users_map_ids.update({record.id: res_users_id})
-
-            # prepare hotel.room.type ids
-            _logger.info("Mapping local with remote 'hotel.room.type' ids...")
-            remote_ids = noderpc.env['hotel.virtual.room'].search([
-                '|', ('active', '=', True), ('active', '=', False)
-            ])
-            remote_xml_ids = noderpc.env['hotel.virtual.room'].browse(
-                remote_ids).get_external_id()
-            room_type_map_ids = {}
-            for key, value in remote_xml_ids.items():
-                room_type_id = self.env['ir.model.data'].xmlid_to_res_id(value)
-                room_type_map_ids.update({int(key): room_type_id})
-
-            # prepare hotel.room ids
-            _logger.info("Mapping local with remote 'hotel.room' ids...")
-            remote_ids = noderpc.env['hotel.room'].search([])
-            remote_hotel_rooms = noderpc.env['hotel.room'].browse(remote_ids)
-            room_map_ids = {}
-            #
-            for remote_hotel_room in remote_hotel_rooms:
-                remote_xml_id = remote_hotel_room.get_external_id()
-                value = list(remote_xml_id.values())[0]
-                room_id = self.env['ir.model.data'].xmlid_to_res_id(value)
-                room_map_ids.update({remote_hotel_room.product_id.id: room_id})
-
-            # prepare channel.ota.info ids
-            _logger.info("Mapping local with remote 'channel.ota.info' ids...")
-            remote_ids = noderpc.env['wubook.channel.info'].search([])
-            remote_records = noderpc.env['wubook.channel.info'].browse(remote_ids)
-            ota_map_ids = {}
-            for record in remote_records:
-                res_ota_id = self.env['channel.ota.info'].search([
-                    ('ota_id', '=', int(record.wid)),
-                ]).id
-                ota_map_ids.update({record.id: res_ota_id})
-
-            # prepare reservation of interest
-            _logger.info("Preparing 'hotel.reservation' of interest...")
-            remote_hotel_reservation_ids = noderpc.env['hotel.reservation'].search(
-                [('checkout', self.migration_date_operator, self.migration_date_d)],
-                order='id ASC',  # assume splitted parents reservation has always lesser id
+    def _fetch_reservation_batch(self, noderpc, remote_ids):
+        # read the reservations and all their night lines with one call each
+        start_time = time.time()
+        rpc_hotel_reservations = self._remote_search_read(
+            noderpc, 'hotel.reservation', remote_ids, REMOTE_RESERVATION_FIELDS)
+        hotel_reservation_lines = []
+        if remote_ids:
+            hotel_reservation_lines = noderpc.env['hotel.reservation.line'].search_read(
+                [('reservation_id', 'in', remote_ids)],
+                ['reservation_id', 'date', 'price']
             )
-            _logger.info("Migrating 'hotel.reservation'...")
-            # disable mail feature to speed-up migration
-            context_no_mail = {
-                'tracking_disable': True,
-                'mail_notrack': True,
-                'mail_create_nolog': True,
-                'connector_no_export': True,
-            }
-            for remote_hotel_reservation_id in remote_hotel_reservation_ids:
+        rpc_reservation_lines = {}
+        for reservation_line in hotel_reservation_lines:
+            rpc_reservation_lines.setdefault(
+                reservation_line['reservation_id'][0], []).append(reservation_line)
+        _logger.info("Fetched %s 'hotel.reservation' with %s 'hotel.reservation.line' in %.2fs",
+                     len(rpc_hotel_reservations), len(hotel_reservation_lines), time.time() - start_time)
+        return rpc_hotel_reservations, rpc_reservation_lines
+
+    @api.multi
+    def _migrate_reservation_ids(self, noderpc, resolver, checkpoint, remote_hotel_reservation_ids,
+                                 res_users_map_ids, room_type_map_ids, room_map_ids, ota_map_ids):
+        # disable mail feature to speed-up migration
+        context_no_mail = {
+            'tracking_disable': True,
+            'mail_notrack': True,
+            'mail_create_nolog': True,
+            'connector_no_export': True,
+        }
+        log_buffer = MigratedLogBuffer(self)
+        batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+        pending_ids = self._pending_remote_ids(resolver, 'hotel.reservation', remote_hotel_reservation_ids)
+        for remote_hotel_reservation_batch_ids, (rpc_hotel_reservations, rpc_reservation_lines) in \
+                self._prefetch_batches(remote_hotel_reservation_ids,
+                                       lambda remote_ids: self._fetch_reservation_batch(noderpc, remote_ids),
+                                       pending_ids):
+            for rpc_hotel_reservation in rpc_hotel_reservations:
+                remote_hotel_reservation_id = rpc_hotel_reservation['id']
                 try:
-                    migrated_hotel_reservation = self.env['hotel.reservation'].search([
-                        ('remote_id', '=', remote_hotel_reservation_id)
-                    ]) or None
-
-                    if not migrated_hotel_reservation:
-                        _logger.info('User #%s started migration of hotel.reservation with remote ID: [%s]',
-                                     self._uid, remote_hotel_reservation_id)
-
-                        rpc_hotel_reservation = noderpc.env['hotel.reservation'].search_read(
-                            [('id', '=', remote_hotel_reservation_id)],
-                            ['folio_id',
-                             'name',
-                             'virtual_room_id',
-                             'product_id',
-                             'discount',
-                             'checkin',
-                             'checkout',
-                             'nights',
-                             'to_assign',
-                             'to_send',
-                             'state',
-                             'cancelled_reason',
-                             'out_service_description',
-                             'adults',
-                             'children',
-                             'splitted',
-                             'parent_reservation',
-                             'overbooking',
-                             'channel_type',
-                             'call_center',
-                             'wrid',
-                             'wbook_json',
-                             'wchannel_id',
-                             'wchannel_reservation_code',
-                             'wstatus',
-                             'wstatus_reason',
-                             'wmodified',
-                             'reservation_lines',
-                             'create_uid',
-                             'last_updated_res',
-                             ],
-                        )[0]
-                        hotel_folio_id = self.env['hotel.folio'].search([
-                            ('remote_id', '=', rpc_hotel_reservation['folio_id'][0])
-                        ]).id or None
+                    _logger.info('User #%s started migration of hotel.reservation with remote ID: [%s]',
+                                 self._uid, remote_hotel_reservation_id)
+
+                    with batcher.record(remote_hotel_reservation_id):
+                        hotel_folio_id = resolver.get('hotel.folio', rpc_hotel_reservation['folio_id'][0])
                         vals = self._prepare_reservation_remote_data(
                             hotel_folio_id,
                             rpc_hotel_reservation,
@@ -807,107 +1204,101 @@ class MigratedHotel(models.Model):
                             room_type_map_ids,
                             room_map_ids,
                             ota_map_ids,
-                            noderpc)
-                        migrated_hotel_reservation = self.env['hotel.reservation'].with_context(
-                            context_no_mail
-                        ).create(vals)
+                            rpc_reservation_lines.get(remote_hotel_reservation_id, []),
+                            resolver)
+                        migrated_hotel_reservation = self._create_or_update('hotel.reservation', vals, resolver,
+                                                                            context_no_mail)
+                    resolver.add('hotel.reservation', remote_hotel_reservation_id,
+                                 migrated_hotel_reservation.id)
 
-                        _logger.info('User #%s migrated hotel.reservation with ID [local, remote]: [%s, %s]',
-                                     self._uid, migrated_hotel_reservation.id, remote_hotel_reservation_id)
+                    _logger.info('User #%s migrated hotel.reservation with ID [local, remote]: [%s, %s]',
+                                 self._uid, migrated_hotel_reservation.id, remote_hotel_reservation_id)
 
                 except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'reservation',
-                        'remote_id': remote_hotel_reservation_id,
-                    })
-                    _logger.error('hotel.reservation with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_hotel_reservation_id, migrated_log.id, err)
+                    log_buffer.add('reservation', remote_hotel_reservation_id, err)
+                    _logger.error('hotel.reservation with ID remote: [%s]: (%s)',
+                                  remote_hotel_reservation_id, err)
                     continue
 
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
-        else:
-            noderpc.logout()
+            batcher.mark_batch(remote_hotel_reservation_batch_ids)
+        batcher.commit()
 
     @api.multi
-    def action_migrate_services(self):
+    @migration_stage('reservations')
+    def action_migrate_reservations(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
-            # prepare services of interest
-            _logger.info("Preparing 'hotel.service' of interest...")
-            remote_hotel_reservation_ids = noderpc.env['hotel.reservation'].search_read(
+            # prepare reference ids
+            res_users_map_ids = self._get_map_ids('res.users', noderpc)
+            room_type_map_ids = self._get_map_ids('hotel.room.type', noderpc)
+            room_map_ids = self._get_map_ids('hotel.room', noderpc)
+            ota_map_ids = self._get_map_ids('channel.ota.info', noderpc)
+
+            # prepare reservation of interest
+            _logger.info("Preparing 'hotel.reservation' of interest...")
+            sync_write_date = self._get_remote_write_date(noderpc, 'hotel.reservation')
+            remote_hotel_reservations = noderpc.env['hotel.reservation'].search_read(
                 [('checkout', self.migration_date_operator, self.migration_date_d)],
-                ['folio_id']
+                ['folio_id'],
+                order='id ASC',  # assume splitted parents reservation has always lesser id
             )
-            remote_ids = [x['folio_id'][0] for x in remote_hotel_reservation_ids]
-            # remove any duplicate values
-            remote_hotel_folio_ids = list(dict.fromkeys(remote_ids))
-            # some folios have no reservations but only services and it is expected to happens for folios before D-date
-            if self.migration_date_operator == '<':
-                remote_hotel_folio_extra_ids = noderpc.env['hotel.folio'].search([
-                    ('room_lines', '=', False)
-                ]) or []
-                remote_hotel_folio_ids = list(set().union(
-                    remote_hotel_folio_ids, remote_hotel_folio_extra_ids
-                ))
+            remote_hotel_reservation_ids = [x['id'] for x in remote_hotel_reservations]
+            # splitted reservations share their folio, so they are migrated by the same worker
+            folio_map_ids = {x['id']: x['folio_id'][0] for x in remote_hotel_reservations}
 
-            _logger.info("Migrating 'hotel.service'...")
-            remote_hotel_service_ids = noderpc.env['hotel.service.line'].search([
-                ('folio_id', 'in', remote_hotel_folio_ids),
-            ], order='id ASC')
-            # disable mail feature to speed-up migration
-            context_no_mail = {
-                'tracking_disable': True,
-                'mail_notrack': True,
-                'mail_create_nolog': True,
-                'connector_no_export': True,
-            }
-            for remote_hotel_service_id in remote_hotel_service_ids:
+            checkpoint = self._get_checkpoint('reservation')
+            resolver = RemoteIdResolver(self.env)
+            remote_hotel_reservation_ids = self._delta_remote_ids(
+                noderpc, 'hotel.reservation', remote_hotel_reservation_ids, checkpoint, resolver)
+
+            _logger.info("Migrating 'hotel.reservation'...")
+            self._migrate_in_workers(
+                '_migrate_reservation_ids', 'reservation', noderpc, resolver,
+                checkpoint, remote_hotel_reservation_ids,
+                (res_users_map_ids, room_type_map_ids, room_map_ids, ota_map_ids),
+                partition_map_ids=folio_map_ids, sync_write_date=sync_write_date)
+
+        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
+            raise ValidationError(err)
+        finally:
+            self._release_noderpc(noderpc)
+
+    @api.multi
+    def _migrate_service_ids(self, noderpc, resolver, checkpoint, remote_hotel_service_ids):
+        # disable mail feature to speed-up migration
+        context_no_mail = {
+            'tracking_disable': True,
+            'mail_notrack': True,
+            'mail_create_nolog': True,
+            'connector_no_export': True,
+        }
+        log_buffer = MigratedLogBuffer(self)
+        batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+
+        def fetch(remote_ids):
+            return self._remote_search_read(noderpc, 'hotel.service.line', remote_ids, REMOTE_SERVICE_FIELDS)
+
+        pending_ids = self._pending_remote_ids(resolver, 'hotel.service', remote_hotel_service_ids)
+        for remote_hotel_service_batch_ids, hotel_services in self._prefetch_batches(
+                remote_hotel_service_ids, fetch, pending_ids):
+            for hotel_service in hotel_services:
+                remote_hotel_service_id = hotel_service['id']
                 try:
-                    migrated_hotel_service = self.env['hotel.service'].search([
-                        ('remote_id', '=', remote_hotel_service_id)
-                    ]) or None
-                    if not migrated_hotel_service:
-                        _logger.info('User #%s started migration of hotel.service with remote ID: [%s]',
-                                     self._uid, remote_hotel_service_id)
-
-                        hotel_service = noderpc.env['hotel.service.line'].search_read(
-                            [('id', '=', remote_hotel_service_id)],
-                            ['folio_id',
-                             'name',
-                             'product_id',
-                             'product_uom_qty',
-                             'price_unit',
-                             'discount',
-                             'channel_type',
-                             'ser_room_line',
-                             'ser_checkin',
-                             'service_line_id',
-                             ]
-                        )[0]
+                    _logger.info('User #%s started migration of hotel.service with remote ID: [%s]',
+                                 self._uid, remote_hotel_service_id)
 
+                    with batcher.record(remote_hotel_service_id):
                         ser_room_line = hotel_service['ser_room_line'] and hotel_service['ser_room_line'][0] or None
                         # services may or may not be associated to a reservation
                         if ser_room_line:
-                            ser_room_line = self.env['hotel.reservation'].search([
-                                ('remote_id', '=', ser_room_line)
-                            ]).id or None
+                            ser_room_line = resolver.get('hotel.reservation', ser_room_line)
 
                         # reservations before D-date are migrated with Odoo 10 products
                         service_line_cmds = [(0, False, {
                             'remote_id': hotel_service['id'],
-                            'product_id': self.env['product.product'].search([
-                                ('remote_id', '=', hotel_service['product_id'][0])
-                            ]).id or None,
+                            'product_id': resolver.get('product.product', hotel_service['product_id'][0]),
                             'ser_room_line': ser_room_line,
                             'name': hotel_service['name'],
                             'product_qty': hotel_service['product_uom_qty'],
@@ -916,152 +1307,218 @@ class MigratedHotel(models.Model):
                             'channel_type': hotel_service['channel_type'] or 'door',
                         })]
 
-                        hotel_folio = self.env['hotel.folio'].search([
-                                ('remote_id', '=', hotel_service['folio_id'][0])
-                            ]) or None
-                        hotel_folio.with_context(
-                            context_no_mail
-                        ).write({'service_ids': service_line_cmds})
+                        hotel_service_id = resolver.get('hotel.service', hotel_service['id'])
+                        hotel_folio_id = resolver.get('hotel.folio', hotel_service['folio_id'][0])
+                        if hotel_service_id:
+                            # delta sync of a service already migrated
+                            self.env['hotel.service'].browse(hotel_service_id).with_context(
+                                context_no_mail
+                            ).write(service_line_cmds[0][2])
+                        elif not hotel_folio_id:
+                            raise ValidationError('hotel.folio with remote ID [%s] not migrated' %
+                                                  hotel_service['folio_id'][0])
+                        else:
+                            self.env['hotel.folio'].browse(hotel_folio_id).with_context(
+                                context_no_mail
+                            ).write({'service_ids': service_line_cmds})
 
-                        _logger.info('User #%s migrated hotel.service with remote ID: [%s]',
-                                     self._uid, remote_hotel_service_id)
+                    _logger.info('User #%s migrated hotel.service with remote ID: [%s]',
+                                 self._uid, remote_hotel_service_id)
 
                 except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'service',
-                        'remote_id': remote_hotel_service_id,
-                    })
-                    _logger.error('hotel.service with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_hotel_service_id, migrated_log.id, err)
+                    log_buffer.add('service', remote_hotel_service_id, err)
+                    _logger.error('hotel.service with ID remote: [%s]: (%s)',
+                                  remote_hotel_service_id, err)
                     continue
 
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
-        else:
-            noderpc.logout()
+            batcher.mark_batch(remote_hotel_service_batch_ids)
+        batcher.commit()
 
     @api.multi
-    def action_migrate_payments(self):
+    @migration_stage('services')
+    def action_migrate_services(self):
         self.ensure_one()
+        noderpc = self._acquire_noderpc()
+
         try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
+            # prepare services of interest
+            _logger.info("Preparing 'hotel.service' of interest...")
+            sync_write_date = self._get_remote_write_date(noderpc, 'hotel.service.line')
+            remote_hotel_reservation_ids = noderpc.env['hotel.reservation'].search_read(
+                [('checkout', self.migration_date_operator, self.migration_date_d)],
+                ['folio_id']
+            )
+            remote_ids = [x['folio_id'][0] for x in remote_hotel_reservation_ids]
+            # remove any duplicate values
+            remote_hotel_folio_ids = list(dict.fromkeys(remote_ids))
+            # some folios have no reservations but only services and it is expected to happens for folios before D-date
+            if self.migration_date_operator == '<':
+                remote_hotel_folio_extra_ids = noderpc.env['hotel.folio'].search([
+                    ('room_lines', '=', False)
+                ]) or []
+                remote_hotel_folio_ids = list(set().union(
+                    remote_hotel_folio_ids, remote_hotel_folio_extra_ids
+                ))
+
+            _logger.info("Migrating 'hotel.service'...")
+            remote_hotel_services = noderpc.env['hotel.service.line'].search_read(
+                [('folio_id', 'in', remote_hotel_folio_ids)],
+                ['folio_id'],
+                order='id ASC',
+            )
+            remote_hotel_service_ids = [x['id'] for x in remote_hotel_services]
+            # services are written through their folio, so each folio is handled by a single worker
+            folio_map_ids = {x['id']: x['folio_id'][0] for x in remote_hotel_services}
+            checkpoint = self._get_checkpoint('service')
+            resolver = RemoteIdResolver(self.env)
+            remote_hotel_service_ids = self._delta_remote_ids(
+                noderpc, 'hotel.service.line', remote_hotel_service_ids, checkpoint, resolver, 'hotel.service')
+            self._migrate_in_workers(
+                '_migrate_service_ids', 'service', noderpc, resolver,
+                checkpoint, remote_hotel_service_ids,
+                partition_map_ids=folio_map_ids, sync_write_date=sync_write_date)
+
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
+        finally:
+            self._release_noderpc(noderpc)
+
+    @api.multi
+    @migration_stage('payments')
+    def action_migrate_payments(self):
+        self.ensure_one()
+        noderpc = self._acquire_noderpc()
 
         try:
-            # prepare account.journal ids
-            _logger.info("Mapping local with remote 'account.journal' ids...")
-            remote_ids = noderpc.env['account.journal'].search([])
-            remote_records = noderpc.env['account.journal'].browse(remote_ids)
-            journal_map_ids = {}
-            for record in remote_records:
-                res_journal_id = self.env['account.journal'].search([
-                    ('name', '=', record.name),
-                ]).id
-                journal_map_ids.update({record.id: res_journal_id})
+            # prepare reference ids
+            journal_map_ids = self._get_map_ids('account.journal', noderpc)
 
             _logger.info("Preparing 'account.payment' of interest...")
+            sync_write_date = self._get_remote_write_date(noderpc, 'account.payment')
             remote_account_payment_ids = noderpc.env['account.payment'].search(
                 [],
                 order='id ASC')
+            checkpoint = self._get_checkpoint('payment')
+            resolver = RemoteIdResolver(self.env)
+            remote_account_payment_ids = self._delta_remote_ids(
+                noderpc, 'account.payment', remote_account_payment_ids, checkpoint, resolver)
+            remote_account_payment_ids = checkpoint._resume_remote_ids(remote_account_payment_ids)
             # disable mail feature to speed-up migration
             context_no_mail = {
                 'tracking_disable': True,
                 'mail_notrack': True,
                 'mail_create_nolog': True,
             }
-            for remote_account_payment_id in remote_account_payment_ids:
-                try:
-                    migrated_account_payment = self.env['account.payment'].search([
-                        ('remote_id', '=', remote_account_payment_id)
-                    ]) or None
-
-                    if not migrated_account_payment:
+            log_buffer = MigratedLogBuffer(self)
+            batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+
+            def fetch(remote_ids):
+                return self._remote_search_read(noderpc, 'account.payment', remote_ids, REMOTE_PAYMENT_FIELDS)
+
+            # posted payments are not updated by a delta sync
+            pending_ids = self._pending_remote_ids(resolver, 'account.payment', remote_account_payment_ids,
+                                                   update=False)
+            for remote_account_payment_batch_ids, account_payments in self._prefetch_batches(
+                    remote_account_payment_ids, fetch, pending_ids):
+                for account_payment in account_payments:
+                    remote_account_payment_id = account_payment['id']
+                    try:
                         _logger.info('User #%s started migration of account.payment with remote ID: [%s]',
                                      self._uid, remote_account_payment_id)
 
-                        account_payment = noderpc.env['account.payment'].search_read([
-                            ('id', '=', remote_account_payment_id)
-                        ])[0]
-                        # search res_partner id
-                        remote_id = account_payment['partner_id'] and account_payment['partner_id'][0]
-                        res_partner_id = self.env['res.partner'].search([
-                            ('remote_id', '=', remote_id)
-                        ]).id or None
-                        # take into account merged partners are not active
-                        if not res_partner_id:
-                            res_partner_id = self.env['res.partner'].search([
-                                ('remote_id', '=', remote_id),
-                                ('active', '=', False)
-                            ]).main_partner_id.id or None
-
-                        # prepare payment related field
-                        remote_id = account_payment['journal_id'] and account_payment['journal_id'][0]
-                        journal_id = remote_id and journal_map_ids.get(remote_id) or None
-
-                        folio_id = None
-                        # prepare folio related field
-                        if account_payment['folio_id']:
-                            folio_id = self.env['hotel.folio'].search([
-                                ('remote_id', '=', account_payment['folio_id'][0])
-                            ]).id
-                        # prepare payment vals
-                        vals = {
-                            'remote_id': account_payment['id'],
-                            'journal_id': journal_id,
-                            'partner_id': res_partner_id,
-                            'amount': account_payment['amount'],
-                            'payment_date': account_payment['payment_date'],
-                            'communication': account_payment['communication'],
-                            'folio_id': folio_id,
-                            'payment_type': 'inbound',
-                            'payment_method_id': 1,
-                            'partner_type': 'customer',
-                            'state': 'draft'
-                        }
-
-                        migrated_hotel_payment = self.env['account.payment'].with_context(
-                            context_no_mail
-                        ).create(vals)
-                        migrated_hotel_payment.with_context(
-                            {'ignore_notification_post': True}
-                        ).post()
+                        with batcher.record(remote_account_payment_id):
+                            # search res_partner id (taking into account merged partners are not active)
+                            remote_id = account_payment['partner_id'] and account_payment['partner_id'][0]
+                            res_partner_id = resolver.partner(remote_id)
+
+                            # prepare payment related field
+                            remote_id = account_payment['journal_id'] and account_payment['journal_id'][0]
+                            journal_id = remote_id and journal_map_ids.get(remote_id) or None
+
+                            folio_id = None
+                            # prepare folio related field
+                            if account_payment['folio_id']:
+                                folio_id = resolver.get('hotel.folio', account_payment['folio_id'][0])
+                            # prepare payment vals
+                            vals = {
+                                'remote_id': account_payment['id'],
+                                'journal_id': journal_id,
+                                'partner_id': res_partner_id,
+                                'amount': account_payment['amount'],
+                                'payment_date': account_payment['payment_date'],
+                                'communication': account_payment['communication'],
+                                'folio_id': folio_id,
+                                'payment_type': 'inbound',
+                                'payment_method_id': 1,
+                                'partner_type': 'customer',
+                                'state': 'draft'
+                            }
+
+                            migrated_hotel_payment = self.env['account.payment'].with_context(
+                                context_no_mail
+                            ).create(vals)
+                            migrated_hotel_payment.with_context(
+                                {'ignore_notification_post': True}
+                            ).post()
+                        resolver.add('account.payment', remote_account_payment_id, migrated_hotel_payment.id)
                         _logger.info('User #%s migrated account.payment with ID [local, remote]: [%s, %s]',
                                      self._uid, migrated_hotel_payment.id, account_payment['id'])
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'payment',
-                        'remote_id': remote_account_payment_id,
-                    })
-                    _logger.error('account.payment with ID remote: [%s] with LOG #%s: (%s)',
-                                  remote_account_payment_id, migrated_log.id, err)
-                    continue
+                    except (ValueError, ValidationError, Exception) as err:
+                        log_buffer.add('payment', remote_account_payment_id, err)
+                        _logger.error('account.payment with ID remote: [%s]: (%s)',
+                                      remote_account_payment_id, err)
+                        continue
+
+                batcher.mark_batch(remote_account_payment_batch_ids)
+            batcher.commit()
+            checkpoint._set_done(sync_write_date)
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
+    def _fetch_payment_return_batch(self, noderpc, remote_ids):
+        # read the returns, their lines and the payments of their journal items with one call each
+        start_time = time.time()
+        rpc_payment_returns = self._remote_search_read(
+            noderpc, 'payment.return', remote_ids, REMOTE_PAYMENT_RETURN_FIELDS)
+        payment_return_lines = []
+        if remote_ids:
+            payment_return_lines = noderpc.env['payment.return.line'].search_read(
+                [('return_id', 'in', remote_ids)],
+                REMOTE_PAYMENT_RETURN_LINE_FIELDS
+            )
+        rpc_payment_return_lines = {}
+        for payment_return_line in payment_return_lines:
+            rpc_payment_return_lines.setdefault(
+                payment_return_line['return_id'][0], []).append(payment_return_line)
+
+        move_line_ids = list(set().union(*[x['move_line_ids'] for x in payment_return_lines]))
+        move_lines = self._remote_search_read(noderpc, 'account.move.line', move_line_ids, ['payment_id'])
+        move_line_payment_ids = {x['id']: x['payment_id'] and x['payment_id'][0] for x in move_lines}
+        # remote payments of every return line, as in line.move_line_ids.payment_id
+        rpc_payment_ids = {}
+        for payment_return_line in payment_return_lines:
+            rpc_payment_ids[payment_return_line['id']] = sorted(set(
+                move_line_payment_ids[x] for x in payment_return_line['move_line_ids']
+                if move_line_payment_ids.get(x)))
+        _logger.info("Fetched %s 'payment.return' with %s 'payment.return.line' and %s 'account.move.line' "
+                     "in %.2fs", len(rpc_payment_returns), len(payment_return_lines), len(move_lines),
+                     time.time() - start_time)
+        return rpc_payment_returns, rpc_payment_return_lines, rpc_payment_ids
+
+    @api.multi
+    @migration_stage('payment_returns')
     def action_migrate_payment_returns(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
             _logger.info("Preparing 'payment.return' of interest...")
             remote_payment_return_ids = noderpc.env['payment.return'].search(
-                [('state', '=', 'done')]
+                [('state', '=', 'done')], order='id ASC'
             )
             _logger.info("Migrating 'payment.return'...")
             # disable mail feature to speed-up migration
@@ -1070,128 +1527,125 @@ class MigratedHotel(models.Model):
                 'mail_notrack': True,
                 'mail_create_nolog': True,
             }
-            for payment_return_id in remote_payment_return_ids:
-                try:
-                    remote_payment_return = noderpc.env['payment.return'].browse(payment_return_id)
-                    remote_payment_return_line = remote_payment_return.line_ids
-
-                    # prepare related payment
-                    remote_payment_id = remote_payment_return_line.move_line_ids.payment_id.id
-                    account_payment = self.env['account.payment'].search([
-                        ('remote_id', '=', remote_payment_id)
-                    ]) or None
-                    account_move_lines = account_payment.move_line_ids.filtered(
-                        lambda x: (x.account_id.internal_type == 'receivable')
-                    )
-                    line_ids_vals = {
-                        'move_line_ids': [(6, False, [x.id for x in account_move_lines])],
-                        'partner_id': account_payment.partner_id.id,
-                        'amount': remote_payment_return_line.amount,
-                        'reference': remote_payment_return_line.reference,
-                    }
-                    vals = {
-                        'name': remote_payment_return.name,
-                        'journal_id': account_payment.journal_id.id,
-                        'date': remote_payment_return.date,
-                        'line_ids': [(0, 0, line_ids_vals)],
-                    }
-
-                    payment_return = self.env['payment.return'].with_context(
-                        context_no_mail
-                    ).create(vals)
-                    payment_return.action_confirm()
-
-                    _logger.info('User #%s migrated payment.return for account.payment with ID '
-                                 '[local, remote]: [%s, %s]',
-                                 self._uid, account_payment.id, remote_payment_id)
+            resolver = RemoteIdResolver(self.env)
+            log_buffer = MigratedLogBuffer(self)
+            batcher = TransactionBatcher(self.env, self.env['migrated.checkpoint'],
+                                         self.migration_commit_interval, log_buffer)
+            # returns committed by a previous run are not migrated again
+            pending_ids = self._pending_remote_ids(resolver, 'payment.return', remote_payment_return_ids,
+                                                   update=False)
+            for remote_payment_return_batch_ids, remote_batch in self._prefetch_batches(
+                    remote_payment_return_ids,
+                    lambda remote_ids: self._fetch_payment_return_batch(noderpc, remote_ids),
+                    pending_ids):
+                rpc_payment_returns, rpc_payment_return_lines, rpc_payment_ids = remote_batch
+                # prefetch the local payments of the batch and their journal items
+                account_payments = self.env['account.payment'].browse(
+                    resolver.get_ids('account.payment', list(set().union(*rpc_payment_ids.values()))))
+                account_payments.mapped('move_line_ids.account_id.internal_type')
+                for remote_payment_return in rpc_payment_returns:
+                    payment_return_id = remote_payment_return['id']
+                    try:
+                        with batcher.record(payment_return_id):
+                            remote_payment_return_lines = rpc_payment_return_lines.get(payment_return_id, [])
+                            if len(remote_payment_return_lines) != 1:
+                                raise ValidationError('payment.return with %s lines is not supported' %
+                                                      len(remote_payment_return_lines))
+                            remote_payment_return_line = remote_payment_return_lines[0]
+
+                            # prepare related payment
+                            remote_payment_ids = rpc_payment_ids.get(remote_payment_return_line['id'], [])
+                            if len(remote_payment_ids) > 1:
+                                raise ValidationError('payment.return line related to several '
+                                                      'account.payment: %s' % remote_payment_ids)
+                            remote_payment_id = remote_payment_ids and remote_payment_ids[0] or False
+                            account_payment_id = resolver.get('account.payment', remote_payment_id)
+                            if not account_payment_id:
+                                raise ValidationError('account.payment with remote ID [%s] not migrated' %
+                                                      remote_payment_id)
+                            account_payment = account_payments.browse(account_payment_id)
+                            account_move_lines = account_payment.move_line_ids.filtered(
+                                lambda x: (x.account_id.internal_type == 'receivable')
+                            )
+                            line_ids_vals = {
+                                'move_line_ids': [(6, False, [x.id for x in account_move_lines])],
+                                'partner_id': account_payment.partner_id.id,
+                                'amount': remote_payment_return_line['amount'],
+                                'reference': remote_payment_return_line['reference'],
+                            }
+                            vals = {
+                                'remote_id': payment_return_id,
+                                'name': remote_payment_return['name'],
+                                'journal_id': account_payment.journal_id.id,
+                                'date': remote_payment_return['date'],
+                                'line_ids': [(0, 0, line_ids_vals)],
+                            }
+
+                            payment_return = self.env['payment.return'].with_context(
+                                context_no_mail
+                            ).create(vals)
+                            payment_return.action_confirm()
+                        resolver.add('payment.return', payment_return_id, payment_return.id)
 
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'return',
-                        'remote_id': payment_return_id,
-                    })
-                    _logger.error('Remote payment.return with ID remote: [%s] with ERROR LOG #%s: (%s)',
-                                  payment_return_id, migrated_log.id, err)
-                    continue
+                        _logger.info('User #%s migrated payment.return for account.payment with ID '
+                                     '[local, remote]: [%s, %s]',
+                                     self._uid, account_payment.id, remote_payment_id)
+
+                    except (ValueError, ValidationError, Exception) as err:
+                        log_buffer.add('return', payment_return_id, err)
+                        _logger.error('Remote payment.return with ID remote: [%s]: (%s)',
+                                      payment_return_id, err)
+                        continue
+
+                batcher.mark_batch(remote_payment_return_batch_ids)
+            batcher.commit()
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
-    def _prepare_invoice_remote_data(self, account_invoice, res_users_map_ids, noderpc):
+    def _prepare_invoice_remote_data(self, account_invoice, res_users_map_ids, invoice_lines,
+                                     sale_line_index, resolver):
         # search res_users ids
         remote_id = account_invoice['user_id'] and account_invoice['user_id'][0]
         res_user_id = remote_id and res_users_map_ids.get(remote_id) or self._context.get('uid', self._uid)
 
-        # prepare partner_id related field
-        default_res_partner = self.env['res.partner'].search([
-            ('user_ids', 'in', self._context.get('uid', self._uid))
-        ])
-        # search res_partner id
+        # search res_partner id (taking into account merged partners are not active)
         remote_id = account_invoice['partner_id'] and account_invoice['partner_id'][0]
-        res_partner_id = self.env['res.partner'].search([
-            ('remote_id', '=', remote_id)
-        ]).id or None
-        # take into account merged partners are not active
-        if not res_partner_id:
-            res_partner_id = self.env['res.partner'].search([
-                ('remote_id', '=', remote_id),
-                ('active', '=', False)
-            ]).main_partner_id.id or None
-        res_partner_id = res_partner_id or default_res_partner.id
+        res_partner_id = resolver.final_partner(remote_id)
 
         # search related refund_invoice_id
         refund_invoice_id = None
         if account_invoice['refund_invoice_id']:
-            refund_invoice_id = self.env['account.invoice'].search([
-                ('remote_id', '=', account_invoice['refund_invoice_id'][0])
-            ]).id or None
+            refund_invoice_id = resolver.get('account.invoice', account_invoice['refund_invoice_id'][0])
 
-        remote_ids = account_invoice['invoice_line_ids'] and account_invoice['invoice_line_ids']
-        invoice_lines = noderpc.env['account.invoice.line'].search_read(
-            [('id', 'in', remote_ids)])
         invoice_line_cmds = []
         # prepare invoice lines
-        reservation_ids_cmds = reservation_line_ids_cmds = service_ids_cmds = None
         for invoice_line in invoice_lines:
-            # search for reservation in sale_order_line
-            remote_reservation_ids = noderpc.env['hotel.reservation'].search([
-                ('order_line_id', 'in', invoice_line['sale_line_ids'])
-            ]) or None
-            if remote_reservation_ids:
-                reservation_ids = self.env['hotel.reservation'].search([
-                    ('remote_id', 'in', remote_reservation_ids)
-                ]).ids or None
-                reservation_ids_cmds = reservation_ids and [[6, False, reservation_ids]] or None
-                # The night is dark and full of terrors
-                reservation_line_ids = self.env['hotel.reservation.line'].search([
-                    ('reservation_id', 'in', reservation_ids)
-                ]).ids
-                reservation_line_ids_cmds = reservation_line_ids and [[6, False, reservation_line_ids]] or None
-
-            # search for services in sale_order_line
-            remote_service_ids = noderpc.env['hotel.service.line'].search([
-                ('service_line_id', 'in', invoice_line['sale_line_ids'])
-            ]) or None
-            if remote_service_ids:
-                service_ids = self.env['hotel.service'].search([
-                    ('remote_id', 'in', remote_service_ids)
-                ]).ids or None
-                service_ids_cmds = service_ids and [[6, False, service_ids]] or None
+            # search for reservations and services in sale_order_line
+            reservation_ids = []
+            service_ids = []
+            for sale_line_id in invoice_line['sale_line_ids']:
+                reservation_ids.extend(sale_line_index['reservation_ids'].get(sale_line_id, []))
+                service_ids.extend(sale_line_index['service_ids'].get(sale_line_id, []))
+            reservation_ids_cmds = reservation_ids and [[6, False, reservation_ids]] or None
+            # The night is dark and full of terrors
+            reservation_line_ids = []
+            for reservation_id in reservation_ids:
+                reservation_line_ids.extend(sale_line_index['reservation_line_ids'].get(reservation_id, []))
+            reservation_line_ids_cmds = reservation_line_ids and [[6, False, reservation_line_ids]] or None
+            service_ids_cmds = service_ids and [[6, False, service_ids]] or None
 
             # take invoice line taxes
             invoice_line_tax_ids = invoice_line['invoice_line_tax_ids'] and invoice_line['invoice_line_tax_ids'][0] or False
             invoice_line_cmds.append((0, False, {
                 'name': invoice_line['name'],
                 'origin': invoice_line['origin'],
-                'reservation_ids': remote_reservation_ids and reservation_ids_cmds,
-                'reservation_line_ids': remote_reservation_ids and reservation_line_ids_cmds,
-                'service_ids': remote_service_ids and service_ids_cmds,
+                'reservation_ids': reservation_ids_cmds,
+                'reservation_line_ids': reservation_line_ids_cmds,
+                'service_ids': service_ids_cmds,
                 # [480, '700000 Ventas de mercaderías en España']
                 'account_id': invoice_line['account_id'] and invoice_line['account_id'][0] or 480,
                 'price_unit': invoice_line['price_unit'],
@@ -1225,31 +1679,75 @@ class MigratedHotel(models.Model):
         return vals
 
     @api.multi
+    def _prepare_sale_line_index(self, noderpc, resolver):
+        # remote sale.order.line ids -> local hotel.reservation and hotel.service ids
+        _logger.info("Indexing remote 'sale.order.line' with local reservations and services...")
+        sale_line_index = {
+            'reservation_ids': {},
+            'service_ids': {},
+            'reservation_line_ids': {},
+        }
+        rpc_hotel_reservations = noderpc.env['hotel.reservation'].search_read(
+            [('order_line_id', '!=', False)],
+            ['order_line_id']
+        )
+        for rpc_hotel_reservation in rpc_hotel_reservations:
+            reservation_id = resolver.get('hotel.reservation', rpc_hotel_reservation['id'])
+            if reservation_id:
+                sale_line_index['reservation_ids'].setdefault(
+                    rpc_hotel_reservation['order_line_id'][0], []).append(reservation_id)
+
+        rpc_hotel_services = noderpc.env['hotel.service.line'].search_read(
+            [('service_line_id', '!=', False)],
+            ['service_line_id']
+        )
+        for rpc_hotel_service in rpc_hotel_services:
+            service_id = resolver.get('hotel.service', rpc_hotel_service['id'])
+            if service_id:
+                sale_line_index['service_ids'].setdefault(
+                    rpc_hotel_service['service_line_id'][0], []).append(service_id)
+
+        self.env.cr.execute('''SELECT reservation_id, id FROM hotel_reservation_line
+                               WHERE reservation_id IS NOT NULL ORDER BY id''')
+        for reservation_id, reservation_line_id in self.env.cr.fetchall():
+            sale_line_index['reservation_line_ids'].setdefault(reservation_id, []).append(reservation_line_id)
+
+        return sale_line_index
+
+    @api.multi
+    def _fetch_invoice_lines(self, noderpc, remote_ids):
+        # read the invoice lines of a whole batch of invoices with one call
+        rpc_invoice_lines = {}
+        if remote_ids:
+            invoice_lines = noderpc.env['account.invoice.line'].search_read(
+                [('invoice_id', 'in', remote_ids)],
+                REMOTE_INVOICE_LINE_FIELDS
+            )
+            for invoice_line in invoice_lines:
+                rpc_invoice_lines.setdefault(invoice_line['invoice_id'][0], []).append(invoice_line)
+        return rpc_invoice_lines
+
+    @api.multi
+    @migration_stage('invoices')
     def action_migrate_invoices(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
-            # prepare res.users ids
-            _logger.info("Mapping local with remote 'res.users' ids...")
-            remote_ids = noderpc.env['res.users'].search([])
-            remote_records = noderpc.env['res.users'].browse(remote_ids)
-            res_users_map_ids = {}
-            for record in remote_records:
-                res_users_id = self.env['res.users'].search([
-                    ('login', '=', record.login),
-                ]).id or self._context.get('uid', self._uid)
-                res_users_map_ids.update({record.id: res_users_id})
+            # prepare reference ids
+            res_users_map_ids = self._get_map_ids('res.users', noderpc)
 
             _logger.info("Preparing 'account.invoice' of interest...")
+            sync_write_date = self._get_remote_write_date(noderpc, 'account.invoice')
             remote_account_invoice_ids = noderpc.env['account.invoice'].search(
                 [('number', 'not in', [False])],
                 order='id ASC'  # ensure refunded invoices are retrieved after the normal invoice
             )
+            checkpoint = self._get_checkpoint('invoice')
+            resolver = RemoteIdResolver(self.env)
+            remote_account_invoice_ids = self._delta_remote_ids(
+                noderpc, 'account.invoice', remote_account_invoice_ids, checkpoint, resolver)
+            remote_account_invoice_ids = checkpoint._resume_remote_ids(remote_account_invoice_ids)
 
             _logger.info("Migrating 'account.invoice'...")
             # disable mail feature to speed-up migration
@@ -1258,143 +1756,147 @@ class MigratedHotel(models.Model):
                 'mail_notrack': True,
                 'mail_create_nolog': True,
             }
-            for remote_account_invoice_id in remote_account_invoice_ids:
-                try:
-                    migrated_account_invoice = self.env['account.invoice'].search(
-                        [('remote_id', '=', remote_account_invoice_id)]
-                    ) or None
-                    if not migrated_account_invoice:
+            sale_line_index = self._prepare_sale_line_index(noderpc, resolver)
+            log_buffer = MigratedLogBuffer(self)
+            batcher = TransactionBatcher(self.env, checkpoint, self.migration_commit_interval, log_buffer)
+
+            def fetch(remote_ids):
+                return (self._remote_search_read(noderpc, 'account.invoice', remote_ids, REMOTE_INVOICE_FIELDS),
+                        self._fetch_invoice_lines(noderpc, remote_ids))
+
+            # validated invoices are not updated by a delta sync
+            pending_ids = self._pending_remote_ids(resolver, 'account.invoice', remote_account_invoice_ids,
+                                                   update=False)
+            for remote_account_invoice_batch_ids, (rpc_account_invoices, rpc_invoice_lines) in \
+                    self._prefetch_batches(remote_account_invoice_ids, fetch, pending_ids):
+                for rpc_account_invoice in rpc_account_invoices:
+                    remote_account_invoice_id = rpc_account_invoice['id']
+                    # checked outside the savepoint of the record, so it is not counted as created
+                    if not (rpc_account_invoice['number'] or '').strip():
+                        continue
+                    try:
                         _logger.info('User #%s started migration of account.invoice with remote ID: [%s]',
                                      self._uid, remote_account_invoice_id)
 
-                        rpc_account_invoice = noderpc.env['account.invoice'].search_read(
-                            [('id', '=', remote_account_invoice_id)],
-                        )[0]
-
-                        if rpc_account_invoice['number'].strip() == '':
-                            continue
+                        with batcher.record(remote_account_invoice_id):
+                            vals = self._prepare_invoice_remote_data(
+                                rpc_account_invoice,
+                                res_users_map_ids,
+                                rpc_invoice_lines.get(remote_account_invoice_id, []),
+                                sale_line_index,
+                                resolver,
+                            )
 
-                        vals = self._prepare_invoice_remote_data(
-                            rpc_account_invoice,
-                            res_users_map_ids,
-                            noderpc,
-                        )
-
-                        migrated_account_invoice = self.env['account.invoice'].with_context(
-                            context_no_mail
-                        ).create(vals)
-                        # this function require a valid vat number in the associated partner_id
-                        migrated_account_invoice.with_context(
-                            {'validate_vat_number': False}
-                        ).action_invoice_open()
-                        #
-                        payment_ids = self.env['account.payment'].search([
-                            ('remote_id', 'in', rpc_account_invoice['payment_ids'])
-                        ]).ids or None
-                        #
-                        if payment_ids:
-                            domain = [
-                                ('account_id', '=', migrated_account_invoice.account_id.id),
-                                ('payment_id', 'in', payment_ids),
-                                ('reconciled', '=', False),
-                                '|', ('amount_residual', '!=', 0.0),
-                                ('amount_residual_currency', '!=', 0.0)
-                            ]
-                            if migrated_account_invoice.type in ('out_invoice', 'in_refund'):
-                                domain.extend([('credit', '>', 0), ('debit', '=', 0)])
-                            else:
-                                domain.extend([('credit', '=', 0), ('debit', '>', 0)])
-                            lines = self.env['account.move.line'].search(domain)
-                            for line in lines:
-                                migrated_account_invoice.assign_outstanding_credit(line.id)
+                            migrated_account_invoice = self.env['account.invoice'].with_context(
+                                context_no_mail
+                            ).create(vals)
+                            # this function require a valid vat number in the associated partner_id
+                            migrated_account_invoice.with_context(
+                                {'validate_vat_number': False}
+                            ).action_invoice_open()
+                            #
+                            payment_ids = resolver.get_ids('account.payment', rpc_account_invoice['payment_ids']) or None
+                            #
+                            if payment_ids:
+                                domain = [
+                                    ('account_id', '=', migrated_account_invoice.account_id.id),
+                                    ('payment_id', 'in', payment_ids),
+                                    ('reconciled', '=', False),
+                                    '|', ('amount_residual', '!=', 0.0),
+                                    ('amount_residual_currency', '!=', 0.0)
+                                ]
+                                if migrated_account_invoice.type in ('out_invoice', 'in_refund'):
+                                    domain.extend([('credit', '>', 0), ('debit', '=', 0)])
+                                else:
+                                    domain.extend([('credit', '=', 0), ('debit', '>', 0)])
+                                lines = self.env['account.move.line'].search(domain)
+                                for line in lines:
+                                    migrated_account_invoice.assign_outstanding_credit(line.id)
+                        resolver.add('account.invoice', remote_account_invoice_id, migrated_account_invoice.id)
 
                         _logger.info('User #%s migrated account.invoice with ID [local, remote]: [%s, %s]',
                                      self._uid, migrated_account_invoice.id, remote_account_invoice_id)
 
-                except (ValueError, ValidationError, Exception) as err:
-                    migrated_log = self.env['migrated.log'].create({
-                        'name': err,
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': 'invoice',
-                        'remote_id': remote_account_invoice_id,
-                    })
-                    _logger.error('Remote account.invoice with ID remote: [%s] with ERROR LOG #%s: (%s)',
-                                  remote_account_invoice_id, migrated_log.id, err)
-                    continue
+                    except (ValueError, ValidationError, Exception) as err:
+                        log_buffer.add('invoice', remote_account_invoice_id, err)
+                        _logger.error('Remote account.invoice with ID remote: [%s]: (%s)',
+                                      remote_account_invoice_id, err)
+                        continue
+
+                batcher.mark_batch(remote_account_invoice_batch_ids)
+            batcher.commit()
+            checkpoint._set_done(sync_write_date)
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
     @api.multi
     def _update_special_field_names(self, model, model_log_code, res_users_map_ids, noderpc):
         # prepare record ids
         _logger.info("Updating '%s' special field names..", model)
-        record_ids = self.env[model].search([
-            ('remote_id', '>', 0)
-        ])
-        for record in record_ids:
+        table = self.env[model]._table
+        self.env.cr.execute('''SELECT remote_id, id, create_date FROM ''' + table + '''
+                               WHERE remote_id > 0 ORDER BY remote_id''')
+        local_records = {}
+        for remote_id, record_id, create_date in self.env.cr.fetchall():
+            local_records.setdefault(remote_id, []).append((record_id, create_date))
+
+        log_buffer = MigratedLogBuffer(self)
+        for remote_batch_ids in self._split_batches(list(local_records)):
+            # one remote read and one bulk update per chunk
+            rpc_records = self._remote_search_read(
+                noderpc, model, remote_batch_ids, ['create_uid', 'create_date'])
+            rpc_records_by_id = {x['id']: x for x in rpc_records}
+            update_values = []
+            for remote_id in remote_batch_ids:
+                rpc_record = rpc_records_by_id.get(remote_id)
+                if not rpc_record:
+                    log_buffer.add(model_log_code, remote_id, 'Remote record not found!')
+                    continue
+                create_uid = rpc_record['create_uid'] and rpc_record['create_uid'][0] or False
+                create_uid = create_uid and res_users_map_ids.get(create_uid) or self._uid
+                for record_id, local_create_date in local_records[remote_id]:
+                    create_date = rpc_record['create_date'] or local_create_date
+                    update_values.append((record_id, create_uid, create_date))
+            if not update_values:
+                continue
+
+            values = ','.join(
+                self.env.cr.mogrify('(%s, %s, %s::timestamp)', x).decode('utf-8')
+                for x in update_values
+            )
             try:
-                rpc_record = noderpc.env[model].search_read(
-                    [('id', '=', record.remote_id)],
-                    ['create_uid', 'create_date'],
-                ) or False
-
-                if rpc_record:
-                    rpc_record = rpc_record[0]
-                    create_uid = rpc_record['create_uid'] and rpc_record['create_uid'][0] or False
-                    create_uid = create_uid and res_users_map_ids.get(create_uid) or self._uid
-                    create_date = rpc_record['create_date'] and rpc_record['create_date'] or record.create_date
-
-                    self.env.cr.execute('''UPDATE ''' + self.env[model]._table + '''
-                                           SET create_uid = %s, create_date = %s WHERE id = %s''',
-                                        (create_uid, create_date, record.id))
-
-                    _logger.info('User #%s has updated %s with ID [local, remote]: [%s, %s]',
-                                 self._uid, model, record.id, record.remote_id)
-                else:
-                    self.env['migrated.log'].create({
-                        'name': 'Remote record not found!',
-                        'date_time': fields.Datetime.now(),
-                        'migrated_hotel_id': self.id,
-                        'model': model_log_code,
-                        'remote_id': record.remote_id,
-                    })
+                with self.env.cr.savepoint():
+                    self.env.cr.execute('''UPDATE ''' + table + ''' AS t
+                                           SET create_uid = v.create_uid, create_date = v.create_date
+                                           FROM (VALUES ''' + values + ''') AS v(id, create_uid, create_date)
+                                           WHERE t.id = v.id''')
+                _logger.info('User #%s has updated %s %s with remote IDs [%s..%s]',
+                             self._uid, len(update_values), model, remote_batch_ids[0], remote_batch_ids[-1])
 
             except (ValueError, ValidationError, Exception) as err:
-                migrated_log = self.env['migrated.log'].create({
-                    'name': err,
-                    'date_time': fields.Datetime.now(),
-                    'migrated_hotel_id': self.id,
-                    'model': model_log_code,
-                    'remote_id': record.remote_id,
-                })
-                _logger.error('Failed updating hotel.folio with ID [local]: [%s] with ERROR LOG #%s: (%s)',
-                              record.id, migrated_log.id, err)
-                continue
+                for remote_id in remote_batch_ids:
+                    log_buffer.add(model_log_code, remote_id, err)
+                _logger.error('Failed updating %s with remote IDs [%s..%s]: (%s)',
+                              model, remote_batch_ids[0], remote_batch_ids[-1], err)
+
+            log_buffer.flush()
+            self.env.cr.commit()
+        log_buffer.flush()
+        # the raw updates bypass the ORM
+        self.env[model].invalidate_cache(['create_uid', 'create_date'])
 
     @api.multi
+    @migration_stage('special_field_names')
     def action_update_special_field_names(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         try:
-            # prepare res.users ids
-            _logger.info("Mapping local with remote 'res.users' ids...")
-            remote_ids = noderpc.env['res.users'].search([])
-            remote_records = noderpc.env['res.users'].browse(remote_ids)
-            res_users_map_ids = {}
-            for record in remote_records:
-                res_users_id = self.env['res.users'].search([
-                    ('login', '=', record.login),
-                ]).id or self._context.get('uid', self._uid)
-                res_users_map_ids.update({record.id: res_users_id})
+            # prepare reference ids
+            res_users_map_ids = self._get_map_ids('res.users', noderpc)
 
             self._update_special_field_names('hotel.folio', 'folio', res_users_map_ids, noderpc)
             self._update_special_field_names('hotel.reservation', 'reservation', res_users_map_ids, noderpc)
@@ -1403,10 +1905,67 @@ class MigratedHotel(models.Model):
 
         except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
             raise ValidationError(err)
-        else:
-            noderpc.logout()
+        finally:
+            self._release_noderpc(noderpc)
 
 
+    @api.multi
+    def action_migrate_delta(self):
+        self.ensure_one()
+        # new products are created as usual, while payment returns are left out: the ones
+        # migrated before they kept their remote id could not be told apart from the new ones
+        self.action_migrate_products()
+        hotel = self.with_context(migration_delta=True)
+        hotel.action_migrate_partners()
+        hotel.action_migrate_folios()
+        hotel.action_migrate_reservations()
+        hotel.action_migrate_services()
+        hotel.action_migrate_payments()
+        hotel.action_migrate_invoices()
+
+    @api.multi
+    def action_migrate_all(self):
+        self.ensure_one()
+        # the stages are forked and run for hours: not from the HTTP worker of this request,
+        # but from a cron worker, which is run once as soon as possible
+        cron = self.env.ref('migrated_hotel.ir_cron_migrate_all').sudo()
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute('SELECT id FROM ir_cron WHERE id = %s FOR UPDATE NOWAIT',
+                                    (cron.id,), log_exceptions=False)
+        except psycopg2.OperationalError:
+            raise ValidationError('Import All is already running, see its progress in the Runs page.')
+        cron.write({
+            'active': True,
+            'numbercall': 1,
+            'nextcall': fields.Datetime.now(),
+        })
+        self.migration_schedule_report = 'Scheduled at %s' % fields.Datetime.now()
+
+    @api.multi
+    def _migrate_all(self):
+        self.ensure_one()
+        start_time = time.time()
+        timings = run_stage_graph(self, STAGE_GRAPH, self.migration_parallel_stages)
+        wall_time = time.time() - start_time
+        stages, path_time = critical_path(STAGE_GRAPH, timings)
+
+        lines = ['%s: %.0fs%s' % (x, timings[x][1] - timings[x][0], ' (failed)' if timings[x][2] else '')
+                 for x in sorted(timings, key=lambda x: timings[x][0])]
+        skipped = [x for x in STAGE_GRAPH if x not in timings]
+        if skipped:
+            lines.append('Skipped: %s' % ', '.join(skipped))
+        lines += [
+            'Critical path: %s (%.0fs)' % (' > '.join(stages), path_time),
+            'Sequential time: %.0fs' % sum(x[1] - x[0] for x in timings.values()),
+            'Wall time: %.0fs' % wall_time,
+        ]
+        for line in lines:
+            _logger.info("Import All: %s", line)
+        # the stages committed their own transactions, read their runs and checkpoints again
+        self.invalidate_cache()
+        self.migration_schedule_report = '\n'.join(lines)
+
     @api.multi
     def action_clean_up(self):
         self.ensure_one()
@@ -1421,14 +1980,11 @@ class MigratedHotel(models.Model):
     @api.multi
     def action_migrate_debug(self):
         self.ensure_one()
-        try:
-            noderpc = odoorpc.ODOO(self.odoo_host, self.odoo_protocol, self.odoo_port)
-            noderpc.login(self.odoo_db, self.odoo_user, self.odoo_password)
-        except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError) as err:
-            raise ValidationError(err)
+        noderpc = self._acquire_noderpc()
 
         import wdb
         wdb.set_trace()
+        self._release_noderpc(noderpc)
 
     @api.model
     def cron_migrate_partners(self):
@@ -1469,6 +2025,16 @@ class MigratedHotel(models.Model):
         self.cron_migrate_reservations()
         self.cron_migrate_services()
 
+    @api.model
+    def cron_migrate_all(self):
+        for hotel in self.env[self._name].search([]):
+            hotel._migrate_all()
+
+    @api.model
+    def cron_migrate_delta(self):
+        for hotel in self.env[self._name].search([]):
+            hotel.action_migrate_delta()
+
     @api.model
     def cron_update_special_field_names(self):
         hotel = self.env[self._name].search([])
@@ -1,7 +1,7 @@
 # Copyright 2019  Pablo Q. Barriuso
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models, fields
+from odoo import models, fields, api
 
 
 class MigrateLog(models.Model):
@@ -25,3 +25,20 @@ class MigrateLog(models.Model):
         help="ID of the remote record in the previous version")
 
     _order = 'date_time desc'
+
+    @api.model
+    def _store_log_entries(self, migrated_hotel, entries):
+        # one multi-row insert for all the (date_time, model, remote_id, name) entries
+        cr = self.env.cr
+        now = fields.Datetime.now()
+        values = ','.join(
+            cr.mogrify('(%s, %s, %s, %s, %s, %s, %s, %s, %s)', (
+                name, date_time, migrated_hotel.id, model, remote_id,
+                self._uid, now, self._uid, now,
+            )).decode('utf-8')
+            for date_time, model, remote_id, name in entries
+        )
+        cr.execute('INSERT INTO migrated_log (name, date_time, migrated_hotel_id, model, remote_id, '
+                   'create_uid, create_date, write_uid, write_date) VALUES ' + values)
+        self.invalidate_cache()
+        migrated_hotel.invalidate_cache(['log_ids'])
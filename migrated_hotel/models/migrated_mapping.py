@@ -0,0 +1,37 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models, fields, api
+
+
+class MigratedMapping(models.Model):
+    _name = 'migrated.mapping'
+
+    migrated_hotel_id = fields.Many2one('migrated.hotel', required=True, ondelete='cascade', index=True)
+    model = fields.Char('Local Model', required=True, readonly=True)
+    remote_id = fields.Integer(
+        required=True, readonly=True,
+        help="ID of the remote record in the previous version "
+             "(for hotel.room, the ID of its remote product)")
+    res_id = fields.Integer(
+        'Local ID', readonly=True,
+        help="ID of the local record, empty if the remote record has no local counterpart")
+
+    _order = 'model, remote_id'
+
+    @api.model
+    def _store_map_ids(self, migrated_hotel, model, map_ids):
+        # one multi-row insert for the whole map
+        cr = self.env.cr
+        now = fields.Datetime.now()
+        values = ','.join(
+            cr.mogrify('(%s, %s, %s, %s, %s, %s, %s, %s)', (
+                migrated_hotel.id, model, remote_id, res_id or None,
+                self._uid, now, self._uid, now,
+            )).decode('utf-8')
+            for remote_id, res_id in map_ids.items()
+        )
+        cr.execute('INSERT INTO migrated_mapping (migrated_hotel_id, model, remote_id, res_id, '
+                   'create_uid, create_date, write_uid, write_date) VALUES ' + values)
+        self.invalidate_cache()
+        migrated_hotel.invalidate_cache(['mapping_ids'])
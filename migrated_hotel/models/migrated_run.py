@@ -0,0 +1,143 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import json
+import logging
+from collections import Counter
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# distinct messages kept by run, and reported when it finishes
+LOG_MESSAGE_LIMIT = 100
+LOG_MESSAGE_REPORTED = 5
+
+
+class MigratedRun(models.Model):
+    _name = 'migrated.run'
+
+    migrated_hotel_id = fields.Many2one('migrated.hotel', required=True, ondelete='cascade', index=True)
+    stage = fields.Selection([
+        ('partners', 'Partners'),
+        ('products', 'Products'),
+        ('folios', 'Folios'),
+        ('reservations', 'Reservations'),
+        ('services', 'Services'),
+        ('payments', 'Payments'),
+        ('payment_returns', 'Payment Returns'),
+        ('invoices', 'Invoices'),
+        ('special_field_names', 'Special Field Names'),
+    ], required=True, readonly=True)
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], readonly=True, default='running')
+    delta = fields.Boolean('Delta Sync', readonly=True,
+                           help="Only remote records written since the last sync were migrated or updated")
+    date_start = fields.Datetime('Start', readonly=True)
+    date_end = fields.Datetime('End', readonly=True)
+    duration = fields.Float('Duration (s)', readonly=True)
+    scanned_count = fields.Integer('Scanned', readonly=True, default=0,
+                                   help="Remote records of interest for the stage")
+    created_count = fields.Integer('Created', readonly=True, default=0)
+    failed_count = fields.Integer('Failed', readonly=True, default=0)
+    skipped_count = fields.Integer('Skipped', compute='_compute_skipped_count',
+                                   help="Remote records already migrated in a previous run")
+    rpc_count = fields.Integer('Remote Calls', readonly=True, default=0)
+    rpc_kbytes = fields.Float('Remote Traffic (KB)', readonly=True, default=0.0)
+    sql_count = fields.Integer('Local Queries', readonly=True, default=0)
+    peak_rss = fields.Integer('Peak Memory (MB)', readonly=True, default=0)
+    vat_check_count = fields.Integer('VAT Checks', readonly=True, default=0,
+                                     help="Distinct (VAT, country) pairs validated by the run")
+    vat_cache_hit_count = fields.Integer('VAT Cache Hits', readonly=True, default=0,
+                                         help="VAT validations answered by the memo of the run")
+    partner_interest_ids = fields.Text('Remote Partners of Interest', readonly=True,
+                                       help="Cached remote ids of the partners referenced by "
+                                            "folios, cardexes, payments and invoices")
+    log_message_counts = fields.Text('Logged Messages', readonly=True,
+                                     help="[model, message, count] of the most repeated messages, as JSON")
+    top_log_messages = fields.Text('Most Repeated Messages', compute='_compute_top_log_messages')
+
+    _order = 'date_start desc, id desc'
+
+    @api.depends('scanned_count', 'created_count', 'failed_count')
+    def _compute_skipped_count(self):
+        for record in self:
+            record.skipped_count = max(record.scanned_count - record.created_count - record.failed_count, 0)
+
+    @api.depends('log_message_counts')
+    def _compute_top_log_messages(self):
+        for record in self:
+            record.top_log_messages = '\n'.join(
+                '%s x [%s] %s' % (count, model, message)
+                for model, message, count in json.loads(record.log_message_counts or '[]'))
+
+    @api.multi
+    def _add_counts(self, scanned=0, created=0, failed=0, rpc_count=0, rpc_bytes=0, sql_count=0, peak_rss=0,
+                    vat_checks=0, vat_cache_hits=0):
+        # increments in place, as the parallel workers of a stage update the same run
+        if not self:
+            return
+        self.env.cr.execute('''UPDATE migrated_run
+                               SET scanned_count = COALESCE(scanned_count, 0) + %s,
+                                   created_count = COALESCE(created_count, 0) + %s,
+                                   failed_count = COALESCE(failed_count, 0) + %s,
+                                   rpc_count = COALESCE(rpc_count, 0) + %s,
+                                   rpc_kbytes = COALESCE(rpc_kbytes, 0) + %s,
+                                   sql_count = COALESCE(sql_count, 0) + %s,
+                                   peak_rss = GREATEST(COALESCE(peak_rss, 0), %s),
+                                   vat_check_count = COALESCE(vat_check_count, 0) + %s,
+                                   vat_cache_hit_count = COALESCE(vat_cache_hit_count, 0) + %s
+                               WHERE id IN %s''',
+                            (scanned, created, failed, rpc_count, rpc_bytes / 1024.0, sql_count, peak_rss,
+                             vat_checks, vat_cache_hits, tuple(self.ids)))
+        self.invalidate_cache()
+
+    @api.multi
+    def _add_log_messages(self, counters):
+        # merged under a row lock, as the parallel workers of a stage update the same run;
+        # only the most repeated messages are kept, the others are in migrated.log
+        for record in self:
+            self.env.cr.execute('SELECT log_message_counts FROM migrated_run WHERE id = %s FOR UPDATE',
+                                (record.id,))
+            log_message_counts = Counter({(model, message): count for model, message, count
+                                          in json.loads(self.env.cr.fetchone()[0] or '[]')})
+            log_message_counts.update(counters)
+            self.env.cr.execute('UPDATE migrated_run SET log_message_counts = %s WHERE id = %s', (
+                json.dumps([[model, message, count] for (model, message), count
+                            in log_message_counts.most_common(LOG_MESSAGE_LIMIT)]),
+                record.id))
+        self.invalidate_cache(['log_message_counts', 'top_log_messages'])
+
+    @api.multi
+    def _finish(self, state, duration):
+        for record in self:
+            record.write({
+                'state': state,
+                'date_end': fields.Datetime.now(),
+                'duration': duration,
+            })
+            _logger.info("Stage '%s' %s in %.0fs: %s scanned, %s created, %s skipped, %s failed, "
+                         "%s remote calls (%.0f KB), %s local queries, %s MB peak memory",
+                         record.stage, state, record.duration, record.scanned_count, record.created_count,
+                         record.skipped_count, record.failed_count, record.rpc_count, record.rpc_kbytes,
+                         record.sql_count, record.peak_rss)
+            if record.vat_check_count:
+                _logger.info("Stage '%s': %s VAT checks, %s answered by the cache", record.stage,
+                             record.vat_check_count + record.vat_cache_hit_count, record.vat_cache_hit_count)
+            for model, message, count in json.loads(record.log_message_counts or '[]')[:LOG_MESSAGE_REPORTED]:
+                _logger.info("Stage '%s': %s x [%s] %s", record.stage, count, model, message)
+
+    @api.multi
+    def _store_partner_interest_ids(self, remote_ids):
+        self.write({'partner_interest_ids': json.dumps(sorted(remote_ids))})
+
+    @api.model
+    def _find_partner_interest_ids(self, migrated_hotel):
+        # the last set discovered for the hotel, None when it must be discovered again
+        run = self.search([
+            ('migrated_hotel_id', '=', migrated_hotel.id),
+            ('partner_interest_ids', '!=', False),
+        ], limit=1)
+        return json.loads(run.partner_interest_ids) if run else None
@@ -0,0 +1,13 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from .log_buffer import MigratedLogBuffer
+from .memory_usage import current_rss, peak_rss, release_env_caches
+from .remote_id_resolver import RemoteIdResolver
+from .remote_prefetch import prefetch_batches
+from .remote_snapshot import RemoteSnapshot, export_snapshot, load_snapshot
+from .transaction_batcher import TransactionBatcher
+from .remote_session import connect_remote, get_session_pool, reset_session_pools, rpc_stats, \
+    add_run_rpc_stats, pop_run_rpc_stats
+from .stage_workers import detach_from_parent, run_in_workers
+from .stage_scheduler import check_stage_graph, critical_path, run_stage_graph
+from .vat_check_cache import VatCheckCache
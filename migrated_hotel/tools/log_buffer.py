@@ -0,0 +1,48 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+from collections import Counter
+
+from odoo import fields
+
+_logger = logging.getLogger(__name__)
+
+
+class MigratedLogBuffer(object):
+    """ Collect the migrated.log entries of a stage in memory and store them
+    with one multi-row insert on :meth:`flush`, i.e. when the batch is committed.
+
+    The same message for the same remote record is stored only once, and
+    `counters` keeps how many times each message was logged for each model.
+    They are added on flush to the migrated.run of the stage (`migration_run_id`
+    in the context), which reports the most repeated ones when it finishes.
+    """
+
+    def __init__(self, migrated_hotel):
+        self.migrated_hotel = migrated_hotel
+        self.counters = Counter()
+        self.run = migrated_hotel.env['migrated.run'].browse(migrated_hotel.env.context.get('migration_run_id'))
+        self._entries = []
+        self._logged_keys = set()
+        self._run_counters = Counter()
+
+    def add(self, model, remote_id, message):
+        message = str(message)
+        self.counters[(model, message)] += 1
+        self._run_counters[(model, message)] += 1
+        key = (model, remote_id, message)
+        if key not in self._logged_keys:
+            self._logged_keys.add(key)
+            self._entries.append((fields.Datetime.now(), model, remote_id, message))
+
+    def flush(self):
+        if self._run_counters:
+            self.run._add_log_messages(self._run_counters)
+            self._run_counters = Counter()
+        if not self._entries:
+            return
+        self.migrated_hotel.env['migrated.log']._store_log_entries(self.migrated_hotel, self._entries)
+        _logger.info('Stored %s migrated.log entries (%s messages logged so far)',
+                     len(self._entries), sum(self.counters.values()))
+        self._entries = []
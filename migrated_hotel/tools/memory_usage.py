@@ -0,0 +1,28 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import os
+import resource
+
+import psutil
+
+
+def current_rss():
+    """ Resident memory of this process, in MB. """
+    return psutil.Process(os.getpid()).memory_info().rss // (1024 * 1024)
+
+
+def peak_rss():
+    """ Highest resident memory reached by this process since it started, in MB. """
+    # ru_maxrss is given in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def release_env_caches(env):
+    """ Drop the record caches and prefetch sets of every environment sharing
+    the cursor of `env`. Along a migration they only grow with records that are
+    never read again, so they must be released once the batch is committed.
+    """
+    env.invalidate_all()
+    for other_env in list(env.all):
+        other_env.prefetch.clear()
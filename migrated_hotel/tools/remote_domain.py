@@ -0,0 +1,85 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+""" Evaluation of the search domains used by the migration over plain remote
+records, i.e. the dicts returned by search_read (many2one values as ids or as
+[id, name] pairs, x2many values as lists of ids).
+"""
+
+
+def _field_value(value):
+    # [id, name] pairs of many2one fields are compared by id
+    if isinstance(value, (list, tuple)) and len(value) == 2 and isinstance(value[1], str):
+        return value[0]
+    return value
+
+
+def _match_leaf(record, leaf):
+    field_name, operator, value = leaf
+    if '.' in field_name:
+        raise ValueError('Dotted field names are not supported: %s' % field_name)
+    record_value = _field_value(record.get(field_name, False))
+
+    if operator in ('=', '!='):
+        if value is False or value is None:
+            match = not record_value
+        elif isinstance(record_value, list):
+            match = value in record_value
+        else:
+            match = record_value == value
+        return match if operator == '=' else not match
+    if operator in ('in', 'not in'):
+        if isinstance(record_value, list):
+            match = bool(set(record_value) & set(value))
+        else:
+            match = record_value in value or (not record_value and False in value)
+        return match if operator == 'in' else not match
+    if operator in ('<', '<=', '>', '>='):
+        if record_value is False or record_value is None:
+            return False
+        if operator == '<':
+            return record_value < value
+        if operator == '<=':
+            return record_value <= value
+        if operator == '>':
+            return record_value > value
+        return record_value >= value
+    if operator in ('like', 'ilike', 'not like', 'not ilike'):
+        record_value = record_value or ''
+        if 'ilike' in operator:
+            match = str(value).lower() in record_value.lower()
+        else:
+            match = str(value) in record_value
+        return not match if operator.startswith('not') else match
+    raise ValueError('Unsupported domain operator: %s' % operator)
+
+
+def _evaluate(record, domain, index):
+    token = domain[index]
+    if token == '!':
+        match, index = _evaluate(record, domain, index + 1)
+        return not match, index
+    if token in ('&', '|'):
+        left, index = _evaluate(record, domain, index + 1)
+        right, index = _evaluate(record, domain, index)
+        return (left and right) if token == '&' else (left or right), index
+    return _match_leaf(record, token), index + 1
+
+
+def match_domain(record, domain):
+    """ Whether `record` satisfies `domain` (prefix notation, implicit '&'). """
+    index = 0
+    match = True
+    while index < len(domain):
+        leaf_match, index = _evaluate(record, domain, index)
+        match = match and leaf_match
+    return match
+
+
+def filter_records(records, domain, active_test=True):
+    """ Records of `records` satisfying `domain`. As in Odoo, archived records
+    are left out unless the domain filters on `active` itself.
+    """
+    if active_test and not any(isinstance(x, (list, tuple)) and x[0] == 'active' for x in domain):
+        records = [x for x in records if x.get('active', True)]
+    return [x for x in records if match_domain(x, domain)]
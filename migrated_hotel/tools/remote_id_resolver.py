@@ -0,0 +1,106 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class RemoteIdResolver(object):
+    """ Per-run map of remote ids to local ids for the migrated models.
+
+    Each model is loaded with one query the first time it is needed and is kept
+    up to date with :meth:`add` as records are created during the run.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self._map_ids = {}
+        # remote_id of archived (merged) partners to their main_partner_id
+        self._merged_partner_map_ids = {}
+        # (partner, company) ids of the user running the migration
+        self._default_partner_ids = None
+
+    def _load(self, model):
+        if model in self._map_ids:
+            return self._map_ids[model]
+
+        cr = self.env.cr
+        map_ids = {}
+        if model == 'res.partner':
+            cr.execute('''SELECT remote_id, id, active, main_partner_id FROM res_partner
+                          WHERE remote_id > 0 ORDER BY id''')
+            for remote_id, res_id, active, main_partner_id in cr.fetchall():
+                if active:
+                    map_ids.setdefault(remote_id, res_id)
+                else:
+                    self._merged_partner_map_ids.setdefault(remote_id, main_partner_id)
+        elif model == 'product.product':
+            # remote_id is stored in the product template
+            cr.execute('''SELECT pt.remote_id, pp.id FROM product_product pp
+                          JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                          WHERE pt.remote_id > 0 ORDER BY pp.id''')
+            for remote_id, res_id in cr.fetchall():
+                map_ids.setdefault(remote_id, res_id)
+        else:
+            cr.execute('SELECT remote_id, id FROM ' + self.env[model]._table +
+                       ' WHERE remote_id > 0 ORDER BY id')
+            for remote_id, res_id in cr.fetchall():
+                map_ids.setdefault(remote_id, res_id)
+
+        _logger.info("Loaded %s remote ids for '%s'", len(map_ids), model)
+        self._map_ids[model] = map_ids
+        return map_ids
+
+    def get(self, model, remote_id):
+        """ Return the local id migrated from `remote_id`, or None.
+        Archived partners are not taken into account, as in a plain search.
+        """
+        if not remote_id:
+            return None
+        return self._load(model).get(remote_id)
+
+    def get_ids(self, model, remote_ids):
+        map_ids = self._load(model)
+        return [map_ids[x] for x in remote_ids or [] if x in map_ids]
+
+    def exists(self, model, remote_id):
+        if self.get(model, remote_id):
+            return True
+        return model == 'res.partner' and remote_id in self._merged_partner_map_ids
+
+    def partner(self, remote_id):
+        """ Return the local partner for `remote_id`, following merged partners
+        (archived in this node) to their main partner.
+        """
+        if not remote_id:
+            return None
+        return self.get('res.partner', remote_id) or \
+            self._merged_partner_map_ids.get(remote_id) or None
+
+    def default_partner_ids(self):
+        """ Return the ids of the partner of the user running the migration and
+        of its company, searched only once per run.
+        """
+        if self._default_partner_ids is None:
+            default_res_partner = self.env['res.partner'].search([
+                ('user_ids', 'in', self.env.context.get('uid', self.env.uid))
+            ])
+            self._default_partner_ids = (default_res_partner.id, default_res_partner.company_id.id)
+        return self._default_partner_ids
+
+    def final_partner(self, remote_id, company=False):
+        """ Return the local partner for `remote_id` as :meth:`partner` does, or the
+        default partner (or its company when `company` is set) if it was not migrated.
+        """
+        default_partner_id, default_company_id = self.default_partner_ids()
+        return self.partner(remote_id) or (default_company_id if company else default_partner_id)
+
+    def add(self, model, remote_id, res_id):
+        self._load(model)[remote_id] = res_id
+
+    def invalidate(self):
+        """ Forget the loaded maps, e.g. after other processes created records. """
+        self._map_ids.clear()
+        self._merged_partner_map_ids.clear()
+        self._default_partner_ids = None
@@ -0,0 +1,65 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import queue
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# end of the batches sent by the prefetch thread
+_DONE = object()
+
+
+def prefetch_batches(batches, fetch, depth=2):
+    """ Yield `(batch, fetch(batch))` for every batch of `batches`.
+
+    With a positive `depth`, a background thread fetches up to `depth` batches
+    ahead of the caller through a bounded queue, so remote reads overlap with
+    the local writes of the current batch. `fetch` runs in that thread: it must
+    only use the remote session, which the caller must not use meanwhile, and
+    never the ORM. Errors raised by `fetch` are raised again in the caller.
+    """
+    batches = list(batches)
+    if depth < 1 or len(batches) < 2:
+        for batch in batches:
+            yield batch, fetch(batch)
+        return
+
+    results = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # give up when the caller stopped consuming, e.g. after an error
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for batch in batches:
+                if stop.is_set() or not put((batch, fetch(batch), None)):
+                    return
+        except Exception as err:
+            put((batch, None, err))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=producer, name='migrated-hotel-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                return
+            batch, result, err = item
+            if err is not None:
+                raise err
+            yield batch, result
+    finally:
+        stop.set()
+        thread.join()
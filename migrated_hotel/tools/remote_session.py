@@ -0,0 +1,255 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import http.client
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+
+import odoorpc
+
+_logger = logging.getLogger(__name__)
+
+# idle sessions older than this (in seconds) are checked before being reused
+SESSION_CHECK_INTERVAL = 600
+# errors raised before the server could process a request sent over a reused connection
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.ResponseNotReady,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class RpcStats(object):
+    """ Remote calls done through one session and bytes exchanged. A session
+    is used by one stage at a time, but also by its prefetch thread.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, bytes_sent, bytes_received):
+        with self._lock:
+            self.calls += 1
+            self.bytes += bytes_sent + bytes_received
+
+    def get(self):
+        with self._lock:
+            return self.calls, self.bytes
+
+
+def rpc_stats(noderpc):
+    """ Return the (calls, bytes) exchanged with the remote node through the
+    session `noderpc`, (0, 0) for a session not opened by :func:`connect_remote`.
+    """
+    stats = getattr(noderpc, '_migration_rpc_stats', None)
+    return stats.get() if stats else (0, 0)
+
+
+# (calls, bytes) of the sessions released by the runs of this process, by migrated.run id
+_run_rpc_stats = {}
+_run_rpc_stats_lock = threading.Lock()
+
+
+def add_run_rpc_stats(run_id, calls, rpc_bytes):
+    if not run_id:
+        return
+    with _run_rpc_stats_lock:
+        run_calls, run_bytes = _run_rpc_stats.get(run_id, (0, 0))
+        _run_rpc_stats[run_id] = (run_calls + calls, run_bytes + rpc_bytes)
+
+
+def pop_run_rpc_stats(run_id):
+    """ Return and forget the (calls, bytes) added for the migrated.run `run_id`. """
+    with _run_rpc_stats_lock:
+        return _run_rpc_stats.pop(run_id, (0, 0))
+
+
+class KeepAliveMixin(object):
+    """ Keep one persistent HTTP connection per host instead of the
+    connection per request opened by the default urllib handlers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connections = {}
+        self.rpc_stats = None
+
+    def _keep_alive_open(self, connection_class, req, **kwargs):
+        key = (req.type, req.host)
+        headers = dict(req.unredirected_hdrs)
+        headers.update((k, v) for k, v in req.headers.items() if k not in headers)
+        headers['Connection'] = 'keep-alive'
+        connection = self._connections.get(key)
+        reused = connection is not None
+        while True:
+            if connection is None:
+                connection = connection_class(req.host, timeout=req.timeout, **kwargs)
+                self._connections[key] = connection
+            try:
+                connection.request(req.get_method(), req.selector, req.data, headers)
+                response = connection.getresponse()
+            except STALE_CONNECTION_ERRORS as err:
+                connection.close()
+                self._connections.pop(key, None)
+                if not reused:
+                    raise urllib.error.URLError(err)
+                # the server closed the idle connection, retry once with a new one
+                connection = None
+                reused = False
+            except (http.client.HTTPException, OSError) as err:
+                connection.close()
+                self._connections.pop(key, None)
+                raise urllib.error.URLError(err)
+            else:
+                break
+        if self.rpc_stats:
+            self.rpc_stats.add(len(req.data or b''), int(response.getheader('Content-Length') or 0))
+        response.url = req.get_full_url()
+        response.msg = response.reason
+        return response
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+class KeepAliveHTTPHandler(KeepAliveMixin, urllib.request.HTTPHandler):
+
+    def http_open(self, req):
+        return self._keep_alive_open(http.client.HTTPConnection, req)
+
+
+class KeepAliveHTTPSHandler(KeepAliveMixin, urllib.request.HTTPSHandler):
+
+    def https_open(self, req):
+        return self._keep_alive_open(http.client.HTTPSConnection, req, context=self._context)
+
+
+def connect_remote(host, protocol, port, db, login, password):
+    """ Return a logged odoorpc session using persistent HTTP connections. """
+    stats = RpcStats()
+    handlers = [KeepAliveHTTPHandler(), KeepAliveHTTPSHandler()]
+    for handler in handlers:
+        handler.rpc_stats = stats
+    opener = urllib.request.build_opener(*(handlers + [urllib.request.HTTPCookieProcessor(CookieJar())]))
+    noderpc = odoorpc.ODOO(host, protocol, port, opener=opener)
+    noderpc.login(db, login, password)
+    noderpc._migration_last_used = time.time()
+    noderpc._migration_rpc_stats = stats
+    return noderpc
+
+
+def close_remote(noderpc):
+    try:
+        noderpc.logout()
+    except (odoorpc.error.RPCError, odoorpc.error.InternalError, urllib.error.URLError):
+        pass
+    for handler in noderpc._connector._opener.handlers:
+        if isinstance(handler, KeepAliveMixin):
+            handler.close()
+
+
+class RemoteSessionPool(object):
+    """ Bounded pool of authenticated odoorpc sessions to one remote node.
+
+    The pool belongs to one process: forked workers start with an empty one
+    (see :func:`reset_session_pools`) and log in their own sessions, which
+    are not counted in the size of the pool of their parent. Idle
+    sessions are only checked again after ``SESSION_CHECK_INTERVAL`` seconds.
+    """
+
+    def __init__(self, host, protocol, port, db, login, password, size):
+        self._params = (host, protocol, port, db, login, password)
+        self.size = size
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle_sessions = []
+
+    def _check(self, noderpc):
+        # re-login sessions expired on the remote node while they were idle
+        if time.time() - noderpc._migration_last_used < SESSION_CHECK_INTERVAL:
+            return noderpc
+        try:
+            session_info = noderpc.json('/web/session/get_session_info', {})
+            if session_info.get('result', {}).get('uid'):
+                return noderpc
+            _logger.info('Remote session expired, logging in again...')
+            noderpc.login(*self._params[3:])
+            return noderpc
+        except (odoorpc.error.RPCError, urllib.error.URLError) as err:
+            _logger.info('Remote session lost (%s), connecting again...', err)
+            close_remote(noderpc)
+            return connect_remote(*self._params)
+
+    def acquire(self, timeout=None):
+        if not self._semaphore.acquire(timeout=timeout):
+            raise odoorpc.error.InternalError(
+                'No remote session available after %s seconds' % timeout)
+        try:
+            with self._lock:
+                noderpc = self._idle_sessions and self._idle_sessions.pop() or None
+            if noderpc:
+                return self._check(noderpc)
+            return connect_remote(*self._params)
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    def release(self, noderpc):
+        noderpc._migration_last_used = time.time()
+        with self._lock:
+            self._idle_sessions.append(noderpc)
+        self._semaphore.release()
+
+    def adopt(self, noderpc):
+        """ Keep a session opened outside the pool, if there is room for it. """
+        with self._lock:
+            if len(self._idle_sessions) < self.size:
+                noderpc._migration_last_used = time.time()
+                self._idle_sessions.append(noderpc)
+                return
+        close_remote(noderpc)
+
+    def clear(self):
+        with self._lock:
+            idle_sessions, self._idle_sessions = self._idle_sessions, []
+        for noderpc in idle_sessions:
+            close_remote(noderpc)
+
+
+_session_pools = {}
+_session_pools_lock = threading.Lock()
+
+
+def get_session_pool(key, host, protocol, port, db, login, password, size):
+    """ Return the session pool of a remote node. A new pool is created whenever
+    the connection parameters of the node change.
+    """
+    params = (host, protocol, port, db, login, password)
+    with _session_pools_lock:
+        pool = _session_pools.get(key)
+        if pool is None or pool._params != params or pool.size != size:
+            if pool is not None:
+                pool.clear()
+            pool = _session_pools[key] = RemoteSessionPool(*(params + (size,)))
+        return pool
+
+
+def reset_session_pools():
+    """ Forget the pools inherited from a parent process without closing their
+    connections, which are still used by the parent, and the remote calls of its runs.
+    """
+    global _session_pools, _session_pools_lock, _run_rpc_stats, _run_rpc_stats_lock
+    _session_pools = {}
+    _session_pools_lock = threading.Lock()
+    _run_rpc_stats = {}
+    _run_rpc_stats_lock = threading.Lock()
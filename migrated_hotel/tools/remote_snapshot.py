@@ -0,0 +1,212 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+""" Offline snapshots of the remote node.
+
+A snapshot is a directory with a ``manifest.json`` file and one gzipped JSON
+lines file per remote model, holding the records as returned by search_read
+(archived ones included). :class:`RemoteSnapshot` answers the search,
+search_read and read_group calls of the migration stages from those files,
+so it can be used in place of an odoorpc session.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from .remote_domain import filter_records
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def _model_file(path, model):
+    return os.path.join(path, '%s.jsonl.gz' % model)
+
+
+def _order_key(field_name):
+    # empty values are sorted last, as NULL values by PostgreSQL
+    def key(record):
+        value = record.get(field_name)
+        if isinstance(value, list) and len(value) == 2:
+            value = value[0]
+        return (value is False or value is None, 0 if value is False or value is None else value)
+    return key
+
+
+def export_snapshot(noderpc, path, models, batch_size=1000):
+    """ Write the records of `models`, a dict {model: (fields, domain)}, read
+    from the remote session `noderpc` into the snapshot directory `path`.
+    The `active` field is added to the models having it. Return the number of
+    records exported per model.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = {
+        'version': noderpc.version,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'models': {},
+    }
+    for model, (fields, domain) in sorted(models.items()):
+        start_time = time.time()
+        remote_model = noderpc.env[model].with_context(active_test=False)
+        fields = list(fields)
+        if 'active' not in fields and 'active' in remote_model.fields_get():
+            fields.append('active')
+        count = 0
+        last_id = 0
+        tmp_file = _model_file(path, model) + '.tmp'
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as snapshot_file:
+            while True:
+                records = remote_model.search_read(
+                    [('id', '>', last_id)] + list(domain or []), fields,
+                    limit=batch_size, order='id ASC')
+                for record in records:
+                    snapshot_file.write(json.dumps(record) + '\n')
+                count += len(records)
+                if len(records) < batch_size:
+                    break
+                last_id = records[-1]['id']
+        os.replace(tmp_file, _model_file(path, model))
+        manifest['models'][model] = {'fields': fields, 'count': count}
+        _logger.info("Exported %s '%s' to the snapshot in %.2fs", count, model, time.time() - start_time)
+
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return {x: manifest['models'][x]['count'] for x in manifest['models']}
+
+
+class SnapshotModel(object):
+    """ The search methods of a remote model, evaluated over its snapshot. """
+
+    def __init__(self, snapshot, model, context=None):
+        self.snapshot = snapshot
+        self.model = model
+        self.context = context or {}
+
+    def with_context(self, *args, **kwargs):
+        return SnapshotModel(self.snapshot, self.model, dict(args[0] if args else self.context, **kwargs))
+
+    def _search_records(self, domain, offset=0, limit=None, order=None, context=None):
+        domain = list(domain or [])
+        self.snapshot._check_fields(self.model, [x[0] for x in domain if isinstance(x, (list, tuple))])
+        active_test = (context or self.context).get('active_test', True)
+        # records are stored by ascending id, the default order of the migration
+        records = filter_records(self.snapshot._records(self.model), domain, active_test=active_test)
+        for order_term in reversed((order or '').split(',')):
+            field_name, dummy, direction = order_term.strip().partition(' ')
+            if field_name and field_name != 'id' or direction.lower() == 'desc':
+                records.sort(key=_order_key(field_name), reverse=direction.lower() == 'desc')
+        offset = offset or 0
+        return records[offset:offset + limit] if limit else records[offset:]
+
+    def search(self, args=None, offset=0, limit=None, order=None, count=False, context=None):
+        records = self._search_records(args, offset, limit, order, context)
+        return len(records) if count else [x['id'] for x in records]
+
+    def search_count(self, args=None, context=None):
+        return len(self._search_records(args, context=context))
+
+    def search_read(self, domain=None, fields=None, offset=0, limit=None, order=None, context=None):
+        records = self._search_records(domain, offset, limit, order, context)
+        if not fields:
+            return [dict(x) for x in records]
+        self.snapshot._check_fields(self.model, fields)
+        return [dict({name: x.get(name, False) for name in fields}, id=x['id']) for x in records]
+
+    def read(self, ids, fields=None, context=None):
+        ids = [ids] if isinstance(ids, int) else ids
+        records_by_id = {x['id']: x for x in self.search_read([('id', 'in', ids)], fields, context=context)}
+        return [records_by_id[x] for x in ids if x in records_by_id]
+
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True, context=None):
+        # only the count of records per value of the first groupby field
+        group_field = groupby[0] if isinstance(groupby, (list, tuple)) else groupby
+        self.snapshot._check_fields(self.model, [group_field])
+        groups = Counter()
+        values = {}
+        for record in self._search_records(domain, context=context):
+            value = record.get(group_field) or False
+            key = value[0] if isinstance(value, list) else value
+            groups[key] += 1
+            values[key] = value
+        keys = sorted(groups, key=lambda x: (x is not False, x))
+        keys = keys[offset:offset + limit] if limit else keys[offset:]
+        return [{
+            group_field: values[x],
+            '%s_count' % group_field: groups[x],
+            '__domain': [(group_field, '=', x)] + list(domain or []),
+        } for x in keys]
+
+
+class SnapshotEnvironment(object):
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.context = {}
+
+    def __getitem__(self, model):
+        return self.snapshot._model(model)
+
+    def __contains__(self, model):
+        return model in self.snapshot.manifest['models']
+
+
+class RemoteSnapshot(object):
+    """ Read-only stand-in of an odoorpc session replaying the snapshot in `path`.
+    Model files are loaded in memory the first time a stage needs them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        self.version = self.manifest['version']
+        self.env = SnapshotEnvironment(self)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model):
+        if model not in self.manifest['models']:
+            raise ValueError("Model '%s' is not in the snapshot %s" % (model, self.path))
+        return SnapshotModel(self, model)
+
+    def _check_fields(self, model, field_names):
+        available = self.manifest['models'][model]['fields']
+        missing = [x for x in field_names if x != 'id' and x not in available]
+        if missing:
+            raise ValueError("Fields %s of '%s' are not in the snapshot %s" % (missing, model, self.path))
+
+    def _records(self, model):
+        # the prefetch thread of a stage may load a model at the same time
+        with self._lock:
+            if model not in self._loaded:
+                start_time = time.time()
+                with gzip.open(_model_file(self.path, model), 'rt', encoding='utf-8') as snapshot_file:
+                    self._loaded[model] = [json.loads(x) for x in snapshot_file]
+                _logger.info("Loaded %s '%s' from the snapshot in %.2fs",
+                             len(self._loaded[model]), model, time.time() - start_time)
+            return self._loaded[model]
+
+    def logout(self):
+        return True
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_snapshot(path):
+    """ Return the :class:`RemoteSnapshot` of `path`, shared by the stages of this
+    process (and inherited by its workers) until the snapshot is exported again.
+    """
+    mtime = os.path.getmtime(os.path.join(path, MANIFEST_FILE))
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is None or snapshot[0] != mtime:
+            snapshot = _snapshots[path] = (mtime, RemoteSnapshot(path))
+        return snapshot[1]
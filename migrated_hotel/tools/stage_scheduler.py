@@ -0,0 +1,122 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+
+from odoo import api, sql_db
+
+from .stage_workers import detach_from_parent
+
+_logger = logging.getLogger(__name__)
+
+
+def _stage_main(dbname, uid, context, hotel_id, stage, method_name):
+    """ Entry point of a forked stage: call `method_name` of the migrated.hotel
+    `hotel_id` with its own cursor, as the button of the stage does.
+    """
+    detach_from_parent()
+
+    exit_code = 0
+    try:
+        with api.Environment.manage():
+            cr = sql_db.db_connect(dbname).cursor()
+            try:
+                env = api.Environment(cr, uid, context)
+                getattr(env['migrated.hotel'].browse(hotel_id), method_name)()
+                cr.commit()
+            finally:
+                cr.close()
+    except Exception:
+        _logger.exception("Stage '%s' failed", stage)
+        exit_code = 1
+    finally:
+        # skip the interpreter clean-up, it would close the inherited connections
+        os._exit(exit_code)
+
+
+def check_stage_graph(graph):
+    """ Raise a ValueError if a dependency of `graph` is not one of its stages,
+    or if its stages depend on each other in a cycle, as they could never start.
+    """
+    for stage, (dummy, dependencies) in graph.items():
+        unknown = [x for x in dependencies if x not in graph]
+        if unknown:
+            raise ValueError("Stage '%s' depends on unknown stages: %s" % (stage, ', '.join(unknown)))
+    ordered = set()
+    pending = set(graph)
+    while pending:
+        ready = {x for x in pending if all(y in ordered for y in graph[x][1])}
+        if not ready:
+            raise ValueError("Stages depend on each other in a cycle: %s" % ', '.join(sorted(pending)))
+        ordered |= ready
+        pending -= ready
+
+
+def critical_path(graph, timings):
+    """ Return the chain of stages of `graph` ({stage: (method_name, dependencies)})
+    with the longest total duration in `timings` ({stage: (start, end, exit_code)}),
+    and that duration: the shortest possible time of the whole migration.
+    """
+    longest = {}
+
+    def visit(stage):
+        if stage not in longest:
+            start, end, dummy = timings.get(stage, (0.0, 0.0, None))
+            before = max((visit(x) for x in graph[stage][1]), key=lambda x: x[1], default=([], 0.0))
+            longest[stage] = (before[0] + [stage], before[1] + (end - start))
+        return longest[stage]
+
+    return max((visit(x) for x in graph), key=lambda x: x[1], default=([], 0.0))
+
+
+def run_stage_graph(hotel, graph, max_parallel=2):
+    """ Run the stages of `graph`, a dict {stage: (method_name, dependencies)},
+    each one in a forked process as soon as all its dependencies succeeded,
+    with at most `max_parallel` stages at a time. Stages depending on a failed
+    one are skipped. Return {stage: (start, end, exit_code)} of the stages run.
+    """
+    check_stage_graph(graph)
+    mp_context = multiprocessing.get_context('fork')
+    # stages use their own cursor, so they only see what is already committed
+    hotel.env.cr.commit()
+    pending = [x for x in graph]
+    running = {}
+    timings = {}
+    failed = set()
+    while pending or running:
+        for stage in list(pending):
+            dependencies = graph[stage][1]
+            if any(x in failed for x in dependencies):
+                _logger.warning("Stage '%s' skipped: %s failed", stage,
+                                ', '.join(x for x in dependencies if x in failed))
+                pending.remove(stage)
+                failed.add(stage)
+            elif len(running) < max(max_parallel, 1) and all(
+                    x in timings and x not in failed for x in dependencies):
+                process = mp_context.Process(
+                    target=_stage_main,
+                    args=(hotel.env.cr.dbname, hotel.env.uid, dict(hotel.env.context), hotel.id,
+                          stage, graph[stage][0]),
+                )
+                process.start()
+                _logger.info("Stage '%s' started", stage)
+                running[stage] = (process, time.time())
+                pending.remove(stage)
+        if not running:
+            continue
+        multiprocessing.connection.wait([x[0].sentinel for x in running.values()])
+        for stage, (process, start_time) in list(running.items()):
+            if process.exitcode is None:
+                continue
+            process.join()
+            del running[stage]
+            timings[stage] = (start_time, time.time(), process.exitcode)
+            if process.exitcode:
+                failed.add(stage)
+            _logger.info("Stage '%s' %s in %.0fs", stage, 'failed' if process.exitcode else 'done',
+                         timings[stage][1] - start_time)
+    return timings
@@ -0,0 +1,93 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import multiprocessing
+import os
+
+from werkzeug.local import release_local
+
+from odoo import api, sql_db
+
+from .memory_usage import peak_rss
+from .remote_id_resolver import RemoteIdResolver
+from .remote_session import reset_session_pools, pop_run_rpc_stats
+
+_logger = logging.getLogger(__name__)
+
+# database connections inherited from the parent process, see detach_from_parent()
+_inherited_pools = []
+
+
+def detach_from_parent():
+    """ Forget the database connections, environments and remote sessions
+    inherited by a forked process, without closing them for its parent.
+    """
+    # The sockets of the parent connections are shared with this process: keep
+    # them referenced so they are never closed here, and use a brand new pool.
+    _inherited_pools.append(sql_db._Pool)
+    sql_db._Pool = None
+    # do not reuse the environments of the parent thread either
+    release_local(api.Environment._local)
+    # nor the remote sessions, their connections belong to the parent
+    reset_session_pools()
+
+
+def _worker_main(dbname, uid, context, hotel_id, method_name, remote_ids, args, index, results):
+    """ Entry point of a forked worker: migrate `remote_ids` calling `method_name`
+    of the migrated.hotel `hotel_id` with its own cursor and remote session.
+    Its peak memory is sent back through the `results` queue.
+    """
+    detach_from_parent()
+
+    exit_code = 0
+    try:
+        with api.Environment.manage():
+            cr = sql_db.db_connect(dbname).cursor()
+            try:
+                env = api.Environment(cr, uid, context)
+                hotel = env['migrated.hotel'].browse(hotel_id)
+                noderpc = hotel._acquire_noderpc()
+                # the checkpoint is moved by the parent process once every worker is done
+                getattr(hotel, method_name)(noderpc, RemoteIdResolver(env), env['migrated.checkpoint'],
+                                            remote_ids, *args)
+                hotel._release_noderpc(noderpc)
+                rpc_count, rpc_bytes = pop_run_rpc_stats(context.get('migration_run_id'))
+                env['migrated.run'].browse(context.get('migration_run_id'))._add_counts(
+                    rpc_count=rpc_count, rpc_bytes=rpc_bytes, sql_count=cr.sql_log_count, peak_rss=peak_rss())
+                cr.commit()
+            finally:
+                cr.close()
+    except Exception:
+        _logger.exception("Worker '%s' for remote IDs [%s..%s] failed",
+                          method_name, remote_ids[0], remote_ids[-1])
+        exit_code = 1
+    finally:
+        results.put((index, peak_rss()))
+        # skip the interpreter clean-up, it would close the inherited connections
+        os._exit(exit_code)
+
+
+def run_in_workers(hotel, method_name, partitions, args=()):
+    """ Run `method_name` of `hotel` in one forked process per partition of
+    remote ids and wait for all of them. Return the exit code and the peak
+    memory (MB) of every worker.
+    """
+    mp_context = multiprocessing.get_context('fork')
+    results = mp_context.SimpleQueue()
+    processes = []
+    for index, remote_ids in enumerate(partitions):
+        process = mp_context.Process(
+            target=_worker_main,
+            args=(hotel.env.cr.dbname, hotel.env.uid, dict(hotel.env.context), hotel.id,
+                  method_name, remote_ids, args, index, results),
+        )
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+    peak_rss_list = [0] * len(processes)
+    while not results.empty():
+        index, rss = results.get()
+        peak_rss_list[index] = rss
+    return [(process.exitcode, rss) for process, rss in zip(processes, peak_rss_list)]
@@ -0,0 +1,82 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from .memory_usage import current_rss, release_env_caches
+
+_logger = logging.getLogger(__name__)
+
+
+class TransactionBatcher(object):
+    """ Migrate every remote record inside its own savepoint and commit the
+    transaction every `interval` records, moving `checkpoint` forward.
+
+    A failing record only rolls back its savepoint, so the caller can log the
+    error in migrated.log and go on with the rest of the batch. The checkpoint
+    is kept below the first failing record, so a resumed run retries it. An empty
+    `checkpoint` (i.e. in a parallel worker) only commits. The entries of
+    `log_buffer` are stored with the batch they belong to.
+
+    The environment caches are released after every commit to keep the memory
+    of long stages flat, and the highest resident memory seen is kept in
+    `peak_rss` (MB). Scanned, created and failed records are added to the
+    migrated.run of the stage (`migration_run_id` in the context) on commit.
+    """
+
+    def __init__(self, env, checkpoint, interval, log_buffer=None):
+        self.env = env
+        self.checkpoint = checkpoint
+        self.log_buffer = log_buffer
+        self.interval = max(interval, 1)
+        self._count = 0
+        self._last_remote_id = 0
+        self._first_failed_id = 0
+        self.peak_rss = current_rss()
+        self.run = env['migrated.run'].browse(env.context.get('migration_run_id'))
+        self._stats = Counter()
+
+    @contextmanager
+    def record(self, remote_id):
+        # records are processed in ascending remote id order
+        if self._count >= self.interval:
+            self.commit()
+        self._count += 1
+        self._last_remote_id = max(self._last_remote_id, remote_id)
+        try:
+            with self.env.cr.savepoint():
+                yield
+        except Exception:
+            # discard the cached values and pending recomputations of the rolled back records
+            self.env.clear()
+            self._stats['failed'] += 1
+            if not self._first_failed_id or remote_id < self._first_failed_id:
+                self._first_failed_id = remote_id
+            raise
+        self._stats['created'] += 1
+
+    def mark_batch(self, remote_ids):
+        # every record of a fetched batch is processed, including the ones skipped
+        if remote_ids:
+            self._last_remote_id = max(self._last_remote_id, max(remote_ids))
+            self._stats['scanned'] += len(remote_ids)
+
+    def commit(self):
+        # flush the pending recomputations before committing and dropping the caches
+        self.env['migrated.checkpoint'].recompute()
+        if self.log_buffer:
+            self.log_buffer.flush()
+        self.peak_rss = max(self.peak_rss, current_rss())
+        self.checkpoint._update_peak_rss(self.peak_rss)
+        self.run._add_counts(peak_rss=self.peak_rss, **self._stats)
+        self._stats.clear()
+        last_remote_id = self._last_remote_id
+        if self._first_failed_id:
+            last_remote_id = min(last_remote_id, self._first_failed_id - 1)
+        self.checkpoint._commit_batch(last_remote_id and [last_remote_id] or [])
+        release_env_caches(self.env)
+        _logger.debug('Committed %s migrated records up to remote ID [%s] (RSS: %s MB)',
+                      self._count, last_remote_id, self.peak_rss)
+        self._count = 0
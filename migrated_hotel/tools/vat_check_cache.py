@@ -0,0 +1,44 @@
+# Copyright 2019  Pablo Q. Barriuso
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+from collections import Counter
+
+_logger = logging.getLogger(__name__)
+
+
+class VatCheckCache(object):
+    """ Memo of the VAT validations of a stage, keyed on (vat, country).
+
+    Many partners share the VAT number of their company, so each distinct pair
+    is validated with :meth:`migrated.hotel.check_vat` only once. Country codes
+    are loaded with one query the first time a fallback check needs them.
+    `counters` keeps the number of checks and of cache hits for the run stats.
+    """
+
+    def __init__(self, migrated_hotel):
+        self.migrated_hotel = migrated_hotel
+        self.counters = Counter()
+        self._results = {}
+        self._country_codes = None
+
+    def country_code(self, country_id):
+        if self._country_codes is None:
+            cr = self.migrated_hotel.env.cr
+            cr.execute('SELECT id, code FROM res_country')
+            self._country_codes = dict(cr.fetchall())
+        return self._country_codes.get(country_id)
+
+    def check(self, vat, country_id):
+        key = (vat, country_id)
+        if key in self._results:
+            self.counters['vat_cache_hits'] += 1
+        else:
+            self.counters['vat_checks'] += 1
+            self._results[key] = self.migrated_hotel.check_vat(
+                vat, country_id, country_code=self.country_code(country_id))
+        return self._results[key]
+
+    def hit_rate(self):
+        total = sum(self.counters.values())
+        return self.counters['vat_cache_hits'] / total if total else 0.0